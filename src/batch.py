@@ -0,0 +1,207 @@
+from puzzle_state import PuzzleState
+from functions import output_to_files, output_iterations_to_files, get_output_files, write_to_solution_file
+from search_trace import SearchTrace
+from search_stats import SearchStats
+from solution_cache import get_solution_cache
+from vectorized import batch_heuristic
+from distance_table import distance_table_solve
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from collections import namedtuple
+import itertools
+
+# A single (puzzle, algorithm, heuristic) run. puzzle_type is the name of the output directory.
+# With trace set, the search path is streamed to a binary Search_Path.trace file instead of Search_Path.txt.
+# budget is a SearchBudget for the algorithms that take one, replacing time_limit.
+# With cache set, these algorithms also go through the solution cache of the worker process.
+# max_depth is the depth bound of iterative deepening, and the f value bound of IDA*.
+# max_nodes is the memory bound of SMA*.
+# weight is the weight of the heuristic in weighted A*, and the initial weight of anytime A*.
+# beam_width is the number of states beam search keeps in each layer.
+Job = namedtuple('Job', ['puzzle_type', 'algorithm', 'heuristic', 'puzzle_number', 'puzzle', 'goal',
+                         'time_limit', 'max_depth', 'trace', 'budget', 'cache', 'max_nodes', 'weight', 'beam_width'],
+                 defaults=[None, False, None, False, None, 1, None])
+
+# The summary of a Job, small enough to be sent back from a worker process.
+# stats is the SearchStats of the algorithms that collect them, and None for the others.
+# exceeded is the name of the budget that stopped the search, if any.
+# improvements are the (solution length, weight, bound, elapsed time) of every search of anytime A*.
+JobResult = namedtuple('JobResult', ['job', 'elapsed', 'solved', 'length_solution', 'length_search',
+                                     'solution_cost', 'search_cost', 'iteration_counts', 'stats', 'exceeded',
+                                     'improvements'],
+                       defaults=[None, None, None])
+
+# The number of Jobs submitted ahead of each worker process, so none of them waits for work
+JOBS_PER_WORKER = 4
+
+
+def solve_job(job: Job) -> JobResult:
+    """ Solves the puzzle of a Job, writes its output files and summarizes the run
+
+    Runs in the worker processes, so only the summary has to be sent back.
+
+    :param job: The Job to run
+    :return: The JobResult
+    """
+    start_state = PuzzleState(job.puzzle, 0)
+    goal_state = PuzzleState(job.goal, 0)
+    heuristic_name = job.heuristic.__name__ if job.heuristic is not None else None
+    iteration_counts = None
+    improvements = None
+    trace = None
+    stats = SearchStats() if job.algorithm in ('a_star', 'sma_star', 'anytime_a_star', 'greedy_best_first',
+                                               'beam_search', 'bidirectional_search', 'depth_first_search',
+                                               'iterative_deepening', 'ida_star') else None
+    cache = get_solution_cache() if job.cache else None
+    if job.trace and job.algorithm != 'ida_star':
+        search_file, solution_file = get_output_files(job.puzzle_type, job.puzzle_number, heuristic_name)
+        trace = SearchTrace(search_file.rsplit('.', 1)[0] + '.trace', start_state.size)
+
+    if job.algorithm == 'a_star':
+        result = PuzzleState.a_star(start_state, goal_state, job.heuristic, job.time_limit, trace=trace,
+                                    stats=stats, budget=job.budget, cache=cache,
+                                    batch_heuristic=batch_heuristic(job.heuristic, goal_state), weight=job.weight)
+    elif job.algorithm == 'sma_star':
+        result = PuzzleState.sma_star(start_state, goal_state, job.heuristic, job.max_nodes, job.time_limit,
+                                      trace=trace, stats=stats, budget=job.budget)
+    elif job.algorithm == 'anytime_a_star':
+        improvements = []
+        solution_file = get_output_files(job.puzzle_type, job.puzzle_number, heuristic_name)[1]
+
+        def on_solution(solution_path, weight, bound, elapsed):
+            improvements.append((len(solution_path) - 1, weight, bound, elapsed))
+            # Keep the best solution so far on disk, in case the run is stopped before the search ends
+            write_to_solution_file(solution_file, solution_path, elapsed)
+
+        result = PuzzleState.anytime_a_star(start_state, goal_state, job.heuristic, job.time_limit, job.weight,
+                                            on_solution=on_solution, trace=trace, stats=stats, budget=job.budget)
+    elif job.algorithm == 'greedy_best_first':
+        result = PuzzleState.greedy_best_first(start_state, goal_state, job.heuristic, job.time_limit, trace=trace,
+                                               stats=stats, budget=job.budget)
+    elif job.algorithm == 'beam_search':
+        result = PuzzleState.beam_search(start_state, goal_state, job.heuristic, job.beam_width, job.time_limit,
+                                         trace=trace, stats=stats, budget=job.budget)
+    elif job.algorithm == 'bidirectional_search':
+        result = PuzzleState.bidirectional_search(start_state, goal_state, job.heuristic, job.time_limit,
+                                                  trace=trace, stats=stats, budget=job.budget)
+    elif job.algorithm == 'depth_first_search':
+        result = PuzzleState.depth_first_search(start_state, goal_state, time_limit=job.time_limit, trace=trace,
+                                                stats=stats, budget=job.budget, cache=cache)
+    elif job.algorithm == 'iterative_deepening':
+        result = PuzzleState.iterative_deepening(start_state, goal_state, job.max_depth, job.time_limit,
+                                                 trace=trace, stats=stats, budget=job.budget, cache=cache)
+    elif job.algorithm == 'distance_table':
+        result = distance_table_solve(start_state, goal_state)
+    elif job.algorithm == 'ida_star':
+        iteration_counts = []
+        result = PuzzleState.ida_star(start_state, goal_state, job.heuristic, job.max_depth, job.time_limit,
+                                      stats=stats, budget=job.budget, iteration_counts=iteration_counts)
+    else:
+        raise ValueError(f"Unknown algorithm: {job.algorithm}")
+
+    solution_path, search_path, elapsed = result
+    exceeded = result.exceeded
+
+    if trace is not None:
+        trace.elapsed = elapsed
+        trace.close()
+        write_to_solution_file(solution_file, solution_path, elapsed)
+        search_path = trace if search_path is not None else None
+    elif iteration_counts is None:
+        output_to_files(job.puzzle_type, job.puzzle_number, search_path, solution_path, elapsed,
+                        heuristic=heuristic_name)
+    else:
+        output_iterations_to_files(job.puzzle_type, job.puzzle_number, iteration_counts, solution_path, elapsed,
+                                   heuristic=heuristic_name)
+
+    # A search that ran out of options without a solution is not solved either, even within its budget
+    if exceeded is not None or not solution_path:
+        return JobResult(job, elapsed, False, 0, 0, 0, 0, iteration_counts, stats, exceeded, improvements)
+
+    if iteration_counts is not None:
+        length_search = sum(expanded for _, expanded in iteration_counts)
+        search_cost = 0
+    else:
+        length_search = len(search_path) if search_path is not None else 0
+        if job.heuristic is None or search_path is None:
+            search_cost = 0
+        elif trace is not None:
+            search_cost = trace.total_cost
+        else:
+            search_cost = sum(node.get_f_value()[0] for node in search_path)
+    solution_cost = sum(node.get_f_value()[0] for node in solution_path) if job.heuristic is not None else 0
+    return JobResult(job, elapsed, True, len(solution_path), length_search, solution_cost, search_cost,
+                     iteration_counts, stats, improvements=improvements)
+
+
+def run_jobs(jobs: list, workers: int = 1):
+    """ Runs the given Jobs, spread over a pool of worker processes
+
+    Each Job enforces its own time limit through its algorithm. The results are yielded as soon as each Job
+    completes, so their order depends on the workers. With a single worker, the Jobs are run one after
+    another in this process, in order.
+
+    :param jobs: The Jobs to run, which are only taken from it as workers become free
+    :param workers: The number of worker processes. Default is 1.
+    :return: A generator of the JobResults
+    """
+    if workers == 1:
+        for job in jobs:
+            yield solve_job(job)
+        return
+
+    jobs = iter(jobs)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # Only submit a few Jobs per worker at a time, so the Jobs can come from a generator over a large puzzle file
+        futures = {executor.submit(solve_job, job) for job in itertools.islice(jobs, workers * JOBS_PER_WORKER)}
+        while futures:
+            done, futures = wait(futures, return_when=FIRST_COMPLETED)
+            for job in itertools.islice(jobs, len(done)):
+                futures.add(executor.submit(solve_job, job))
+            for future in done:
+                yield future.result()
+
+
+def aggregate_results(results: list) -> tuple:
+    """ Collects the statistics printed by print_astar_data() and print_data() from JobResults
+
+    The results are sorted by puzzle number first, so the statistics do not depend on the order the
+    Jobs completed in.
+
+    :param results: The JobResults of a single algorithm and heuristic
+    :return: The lengths of the solution paths, the lengths of the search paths, the costs of the solution
+             paths, the costs of the search paths, the execution times and the number of no solution, as a tuple.
+    """
+    length_solution = []
+    length_search = []
+    solution_cost = []
+    search_cost = []
+    execution_time = []
+    nb_no_solution = 0
+
+    for result in sorted(results, key=lambda result: result.job.puzzle_number):
+        if not result.solved:
+            nb_no_solution += 1
+            continue
+        length_solution.append(result.length_solution)
+        length_search.append(result.length_search)
+        solution_cost.append(result.solution_cost)
+        search_cost.append(result.search_cost)
+        execution_time.append(result.elapsed)
+
+    return length_solution, length_search, solution_cost, search_cost, execution_time, nb_no_solution
+
+
+def merge_stats(results: list):
+    """ Adds up the SearchStats of JobResults, solved or not
+
+    :param results: The JobResults of a single algorithm and heuristic
+    :return: The merged SearchStats, or None if none of the results has any
+    """
+    merged = None
+    for result in results:
+        if result.stats is None:
+            continue
+        if merged is None:
+            merged = SearchStats(result.stats.timing)
+        merged.merge(result.stats)
+    return merged
@@ -0,0 +1,243 @@
+from puzzle_state import PuzzleState
+from corpus import goal_tiles, scramble
+from search_stats import SearchStats
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+import tracemalloc
+
+# name: (size, scramble depth, number of puzzles)
+CORPORA = {
+    '2x2': (2, 6, 10),
+    '3x3': (3, 12, 10),
+    '4x4': (4, 14, 5),
+}
+DEFAULT_SEED = 472
+
+# Differences smaller than these are noise, whatever the relative threshold says
+MINIMUM_TIME_DIFFERENCE = 0.01
+MINIMUM_MEMORY_DIFFERENCE = 64 * 1024
+
+# name: (algorithm, heuristic)
+ENGINES = {
+    'a_star/sum_permutation': ('a_star', PuzzleState.sum_permutation),
+    'a_star/hamming_distance': ('a_star', PuzzleState.hamming_distance),
+    'a_star/manhattan_distance': ('a_star', PuzzleState.manhattan_distance),
+    'depth_first_search': ('depth_first_search', None),
+    'iterative_deepening': ('iterative_deepening', None),
+}
+
+
+def build_corpus(name: str, seed: int = DEFAULT_SEED) -> tuple:
+    """ Builds one of the fixed benchmark corpora
+
+    :param name: The name of the corpus, one of CORPORA
+    :param seed: The seed of the random number generator
+    :return: The goal state and the puzzles, as a tuple
+    """
+    size, depth, count = CORPORA[name]
+    rng = random.Random(f'{seed}-{name}')
+    goal = goal_tiles(size)
+    puzzles = []
+    for _ in range(count):
+        tiles = scramble(list(goal), size, depth, rng)
+        puzzles.append(tuple(tuple(tiles[row:row + size]) for row in range(0, size * size, size)))
+    return tuple(goal[row:row + size] for row in range(0, size * size, size)), puzzles
+
+
+def run_engine(engine: str, puzzle: tuple, goal: tuple, time_limit, stats=None):
+    """ Runs a single engine on a single puzzle
+
+    :param engine: The name of the engine, one of ENGINES
+    :param puzzle: The puzzle to solve
+    :param goal: The goal state
+    :param time_limit: The time limit
+    :param stats: A SearchStats to fill in. Default is None.
+    :return: The solution path, the search path and the elapsed time, as a SearchResult
+    """
+    algorithm, heuristic = ENGINES[engine]
+    start_state = PuzzleState(puzzle, 0)
+    goal_state = PuzzleState(goal, 0)
+    if algorithm == 'a_star':
+        return PuzzleState.a_star(start_state, goal_state, heuristic, time_limit, stats=stats)
+    if algorithm == 'depth_first_search':
+        return PuzzleState.depth_first_search(start_state, goal_state, time_limit=time_limit, stats=stats)
+    return PuzzleState.iterative_deepening(start_state, goal_state, 100, time_limit, stats=stats)
+
+
+def benchmark_engine(engine: str, corpus: str, seed: int, repeat: int, warmup: int, time_limit) -> dict:
+    """ Times a single engine over a whole corpus
+
+    Every puzzle is run warmup times without being measured, then repeat times. Of the measured runs, the one
+    with the median time is kept, along with its outcome and the number of nodes it expanded, as counted by its
+    SearchStats (over every iteration, for iterative deepening). The peak memory is measured by one more run
+    under tracemalloc, since tracing slows the search down.
+
+    :param engine: The name of the engine, one of ENGINES
+    :param corpus: The name of the corpus, one of CORPORA
+    :param seed: The seed of the corpus
+    :param repeat: The number of measured runs of each puzzle, at least 1
+    :param warmup: The number of unmeasured runs of each puzzle
+    :param time_limit: The time limit of each run
+    :return: The measurements, as a dict
+    """
+    if repeat < 1:
+        raise ValueError("Every puzzle must be measured at least once.")
+    goal, puzzles = build_corpus(corpus, seed)
+    total_time = 0.0
+    nodes_expanded = 0
+    solution_length = 0
+    peak_memory = 0
+    solved = 0
+
+    for puzzle in puzzles:
+        for _ in range(warmup):
+            run_engine(engine, puzzle, goal, time_limit)
+
+        runs = []
+        for _ in range(repeat):
+            stats = SearchStats()
+            start_time = time.perf_counter()
+            result = run_engine(engine, puzzle, goal, time_limit, stats)
+            runs.append((time.perf_counter() - start_time, result, stats))
+        runs.sort(key=lambda run: run[0])
+        run_time, result, stats = runs[(repeat - 1) // 2]
+
+        tracemalloc.start()
+        run_engine(engine, puzzle, goal, time_limit)
+        peak_memory = max(peak_memory, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+
+        # Every run counts towards the nodes per second, solved or not, like it counts towards the time
+        total_time += run_time
+        nodes_expanded += stats.expanded
+        if result.exceeded is None and result.solution_path:
+            solved += 1
+            solution_length += len(result.solution_path) - 1
+
+    return {
+        'corpus': corpus,
+        'engine': engine,
+        'puzzles': len(puzzles),
+        'solved': solved,
+        'time': total_time,
+        'nodes_expanded': nodes_expanded,
+        'nodes_per_second': nodes_expanded / total_time if total_time else 0.0,
+        'peak_memory': peak_memory,
+        'solution_length': solution_length,
+    }
+
+
+def run_benchmarks(corpora: list, engines: list, seed: int = DEFAULT_SEED, repeat: int = 3, warmup: int = 1,
+                   time_limit=10) -> dict:
+    """ Benchmarks every engine on every corpus
+
+    :param corpora: The names of the corpora to use
+    :param engines: The names of the engines to time
+    :param seed: The seed of the corpora
+    :param repeat: The number of measured runs of each puzzle, at least 1
+    :param warmup: The number of unmeasured runs of each puzzle
+    :param time_limit: The time limit of each run
+    :return: The report, as a dict ready to be saved as JSON
+    """
+    results = []
+    for corpus in corpora:
+        for engine in engines:
+            result = benchmark_engine(engine, corpus, seed, repeat, warmup, time_limit)
+            print(f"{corpus} {engine}: {result['solved']}/{result['puzzles']} solved, {result['time']:.4f} s, "
+                  f"{result['nodes_per_second']:.0f} nodes/s, {result['peak_memory']} bytes")
+            results.append(result)
+
+    return {
+        'python': platform.python_version(),
+        'seed': seed,
+        'repeat': repeat,
+        'warmup': warmup,
+        'time_limit': time_limit,
+        'results': results,
+    }
+
+
+def compare_reports(baseline: dict, current: dict, threshold: float = 0.1) -> list:
+    """ Finds the regressions of a benchmark report compared to a baseline report
+
+    A result regresses if it solves fewer puzzles, finds longer solutions, or takes more time or memory
+    than the threshold allows. Very small absolute differences of time and memory are ignored.
+
+    :param baseline: The baseline report
+    :param current: The report to check
+    :param threshold: The allowed relative increase of time and memory. Default is 0.1, for 10%.
+    :return: The regressions, as a list of strings
+    """
+    baseline_results = {(result['corpus'], result['engine']): result for result in baseline['results']}
+    regressions = []
+    for result in current['results']:
+        old = baseline_results.get((result['corpus'], result['engine']))
+        if old is None:
+            continue
+        name = f"{result['corpus']} {result['engine']}"
+        if result['solved'] < old['solved']:
+            regressions.append(f"{name}: solved {result['solved']} puzzles instead of {old['solved']}")
+        elif result['solved'] == old['solved'] and result['solution_length'] > old['solution_length']:
+            regressions.append(f"{name}: solution length {result['solution_length']} "
+                               f"instead of {old['solution_length']}")
+        for measure, minimum_difference in (('time', MINIMUM_TIME_DIFFERENCE),
+                                            ('peak_memory', MINIMUM_MEMORY_DIFFERENCE)):
+            if (result[measure] > old[measure] * (1 + threshold)
+                    and result[measure] - old[measure] > minimum_difference):
+                regressions.append(f"{name}: {measure} {result[measure]:.4g} instead of {old[measure]:.4g}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks the search algorithms on fixed, seeded puzzles.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = subparsers.add_parser('run', help="run the benchmarks and save them as JSON")
+    run_parser.add_argument('--output', default='benchmark.json', help="the JSON file to write")
+    run_parser.add_argument('--corpora', nargs='+', default=list(CORPORA), choices=list(CORPORA))
+    run_parser.add_argument('--engines', nargs='+', default=list(ENGINES), choices=list(ENGINES))
+    run_parser.add_argument('--seed', type=int, default=DEFAULT_SEED)
+    run_parser.add_argument('--repeat', type=int, default=3, help="the number of measured runs, at least 1")
+    run_parser.add_argument('--warmup', type=int, default=1)
+    run_parser.add_argument('--time-limit', type=float, default=10)
+    run_parser.add_argument('--baseline', help="a JSON report to compare the new one against")
+    run_parser.add_argument('--threshold', type=float, default=0.1)
+
+    compare_parser = subparsers.add_parser('compare', help="compare a JSON report against a baseline")
+    compare_parser.add_argument('baseline', help="the baseline JSON report")
+    compare_parser.add_argument('current', help="the JSON report to check")
+    compare_parser.add_argument('--threshold', type=float, default=0.1)
+
+    arguments = parser.parse_args()
+    if arguments.command == 'run' and arguments.repeat < 1:
+        parser.error("--repeat must be at least 1")
+
+    if arguments.command == 'run':
+        report = run_benchmarks(arguments.corpora, arguments.engines, arguments.seed, arguments.repeat,
+                                arguments.warmup, arguments.time_limit)
+        with open(arguments.output, 'wt') as file:
+            json.dump(report, file, indent=2)
+        if arguments.baseline is None:
+            return
+        baseline_file = arguments.baseline
+    else:
+        with open(arguments.current, 'rt') as file:
+            report = json.load(file)
+        baseline_file = arguments.baseline
+
+    with open(baseline_file, 'rt') as file:
+        baseline = json.load(file)
+    regressions = compare_reports(baseline, report, arguments.threshold)
+    for regression in regressions:
+        print("REGRESSION", regression)
+    if regressions:
+        sys.exit(1)
+    print("No regressions")
+
+
+if __name__ == '__main__':
+    main()
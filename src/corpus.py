@@ -0,0 +1,212 @@
+from puzzle_state import _swap_moves
+from puzzle_file import write_binary_puzzles
+from distance_table import get_distance_table, unrank_permutation, MAX_TABLE_SIZE
+from functions import check_or_create_directory
+from concurrent.futures import ProcessPoolExecutor
+from collections import deque
+from functools import lru_cache
+import argparse
+import itertools
+import random
+import os
+
+# The number of puzzles generated together, each chunk with its own random generator
+CHUNK_SIZE = 10000
+# The number of chunks submitted ahead of each worker process
+CHUNKS_PER_WORKER = 2
+
+
+def goal_tiles(size: int) -> tuple:
+    """ Gets the tiles of the goal state the corpus is generated from, in row-major order
+
+    :param size: The size of the puzzle
+    :return: The tiles 1, 2, ..., size * size, as a tuple
+    """
+    return tuple(range(1, size * size + 1))
+
+
+def chunk_random(seed: int, chunk_index: int) -> random.Random:
+    """ Creates the random generator of a chunk
+
+    Every chunk is seeded from the corpus seed and its own index, so a corpus does not depend on how many worker
+    processes generated it.
+
+    :param seed: The seed of the corpus
+    :param chunk_index: The index of the chunk
+    :return: The Random instance
+    """
+    return random.Random(f'{seed}:{chunk_index}')
+
+
+def scramble(tiles: list, size: int, depth: int, rng: random.Random) -> list:
+    """ Scrambles tiles with a random walk of swaps that never undoes its last swap
+
+    The exact distance of the result can be lower than the depth, since the walk can come back closer to where it
+    started.
+
+    :param tiles: The tiles, in row-major order, which are scrambled in place
+    :param size: The size of the puzzle
+    :param depth: The number of swaps
+    :param rng: The random generator
+    :return: The tiles
+    """
+    moves = _swap_moves(size)
+    last_move = None
+    for _ in range(depth):
+        move = rng.choice(moves)
+        while move is last_move:
+            move = rng.choice(moves)
+        first_index, second_index = move
+        tiles[first_index], tiles[second_index] = tiles[second_index], tiles[first_index]
+        last_move = move
+    return tiles
+
+
+@lru_cache(maxsize=None)
+def ranks_at_distance(size: int, distance: int) -> list:
+    """ Gets every relabelled state at an exact distance from the goal, loading the distance table if needed
+
+    Cached, so each worker process only scans the table once.
+
+    :param size: The size of the puzzle, up to MAX_TABLE_SIZE
+    :param distance: The distance
+    :return: The ranks of the relabelled states
+    """
+    ranks = get_distance_table(size).ranks_at_distance(distance)
+    if not ranks:
+        raise ValueError(f"No {size}-by-{size} puzzle is {distance} swaps away from the goal.")
+    return ranks
+
+
+def generate_chunk(chunk_index: int, count: int, size: int, seed: int, depth: int = None,
+                   distance: int = None) -> list:
+    """ Generates the puzzles of a chunk
+
+    :param chunk_index: The index of the chunk
+    :param count: The number of puzzles in the chunk
+    :param size: The size of the puzzles
+    :param seed: The seed of the corpus
+    :param depth: The number of random swaps from the goal state. Default is None, for fully shuffled puzzles.
+    :param distance: The exact distance from the goal state, instead of a depth. Default is None.
+    :return: The puzzles, as tuples of tuples
+    """
+    rng = chunk_random(seed, chunk_index)
+    goal = goal_tiles(size)
+    if distance is not None:
+        ranks = ranks_at_distance(size, distance)
+    puzzles = []
+    for _ in range(count):
+        if distance is not None:
+            # Relabelled states index the tiles of the goal
+            tiles = [goal[index] for index in unrank_permutation(rng.choice(ranks), size * size)]
+        elif depth is not None:
+            tiles = scramble(list(goal), size, depth, rng)
+        else:
+            tiles = list(goal)
+            rng.shuffle(tiles)
+        puzzles.append(tuple(tuple(tiles[row:row + size]) for row in range(0, size * size, size)))
+    return puzzles
+
+
+def generate_puzzles(count: int, size: int = 3, seed: int = 0, depth: int = None, distance: int = None,
+                     workers: int = 1):
+    """ Generates a corpus of puzzles from the goal state given by goal_tiles()
+
+    The puzzles are generated in chunks of CHUNK_SIZE, spread over a pool of worker processes, and yielded in
+    order. Only a few chunks per worker are generated ahead of the ones being yielded, so any number of puzzles
+    can be generated in bounded memory. The same seed always gives the same puzzles, whatever the number of
+    workers.
+
+    :param count: The number of puzzles
+    :param size: The size of the puzzles. Default is 3.
+    :param seed: The seed of the corpus. Default is 0.
+    :param depth: The number of random swaps from the goal state. Default is None, for fully shuffled puzzles.
+    :param distance: The exact distance from the goal state, instead of a depth, for puzzles up to MAX_TABLE_SIZE.
+                     Default is None.
+    :param workers: The number of worker processes. Default is 1.
+    :return: A generator of the puzzles, as tuples of tuples
+    """
+    if count < 0 or size < 2:
+        raise ValueError("The count cannot be negative, and the size must be at least 2.")
+    if depth is not None and distance is not None:
+        raise ValueError("A corpus has either a depth or a distance, not both.")
+    if depth is not None and depth < 0:
+        raise ValueError("The depth cannot be negative.")
+    if distance is not None:
+        if size > MAX_TABLE_SIZE:
+            raise ValueError(f"Exact distances only go up to {MAX_TABLE_SIZE}x{MAX_TABLE_SIZE} puzzles.")
+        # Check the distance, and build the table once here, instead of in every worker
+        ranks_at_distance(size, distance)
+
+    chunks = ((chunk_index, min(CHUNK_SIZE, count - start), size, seed, depth, distance)
+              for chunk_index, start in enumerate(range(0, count, CHUNK_SIZE)))
+    if workers == 1:
+        for chunk in chunks:
+            yield from generate_chunk(*chunk)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = deque(executor.submit(generate_chunk, *chunk)
+                        for chunk in itertools.islice(chunks, workers * CHUNKS_PER_WORKER))
+        while futures:
+            puzzles = futures.popleft().result()
+            for chunk in itertools.islice(chunks, 1):
+                futures.append(executor.submit(generate_chunk, *chunk))
+            yield from puzzles
+
+
+def write_text_puzzles(puzzle_file: str, puzzles) -> int:
+    """ Writes puzzles to a text puzzle file, one per line, as they come
+
+    :param puzzle_file: The path to the file
+    :param puzzles: The puzzles, as tuples of tuples
+    :return: The number of puzzles written
+    """
+    count = 0
+    # Write to a temporary file first, so a failed generation never leaves a half-written puzzle file behind
+    temporary_file = f'{puzzle_file}.{os.getpid()}.tmp'
+    try:
+        with open(temporary_file, 'w') as file:
+            for puzzle in puzzles:
+                file.write(str(puzzle) + '\n')
+                count += 1
+        os.replace(temporary_file, puzzle_file)
+    finally:
+        if os.path.exists(temporary_file):
+            os.remove(temporary_file)
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generates a reproducible corpus of puzzles and its goal state.")
+    parser.add_argument('--count', type=int, default=20, help="the number of puzzles")
+    parser.add_argument('--size', type=int, default=3, help="the size of the puzzles")
+    parser.add_argument('--seed', type=int, default=0, help="the seed of the random generators")
+    difficulty = parser.add_mutually_exclusive_group()
+    difficulty.add_argument('--depth', type=int, help="the number of random swaps from the goal state")
+    difficulty.add_argument('--distance', type=int,
+                            help=f"the exact distance from the goal state, up to {MAX_TABLE_SIZE}x{MAX_TABLE_SIZE}")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="the number of worker processes")
+    parser.add_argument('--binary', action='store_true', help="write a binary puzzle file instead of a text one")
+    parser.add_argument('--output', default='../input/input_puzzles.txt', help="the puzzle file to write")
+    parser.add_argument('--goal-output', default='../input/goal_state.txt', help="the goal state file to write")
+    arguments = parser.parse_args()
+
+    for output in (arguments.output, arguments.goal_output):
+        check_or_create_directory(os.path.dirname(output) or '.')
+    puzzles = generate_puzzles(arguments.count, arguments.size, arguments.seed, arguments.depth, arguments.distance,
+                               arguments.workers)
+    if arguments.binary:
+        count = write_binary_puzzles(arguments.output, puzzles)
+    else:
+        count = write_text_puzzles(arguments.output, puzzles)
+
+    size = arguments.size
+    goal = goal_tiles(size)
+    with open(arguments.goal_output, 'w') as file:
+        file.write(str(tuple(goal[row:row + size] for row in range(0, size * size, size))))
+    print(f"{count} puzzles written to {arguments.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,276 @@
+from puzzle_state import _swap_moves, _tile_indices
+from functions import check_or_create_directory
+from search_budget import SearchResult
+import argparse
+import math
+import mmap
+import os
+import time
+
+TABLE_DIRECTORY = '../pattern_databases'
+# Above this size, the number of states (size^2 factorial) is too large to store
+MAX_TABLE_SIZE = 3
+UNREACHED = 255
+_MAGIC = b'SDTB'
+_HEADER_LENGTH = 5
+
+# In-memory cache of the loaded tables, keyed by size
+_tables = {}
+
+
+def rank_permutation(permutation) -> int:
+    """ Computes the rank of a permutation of 0, 1, ..., n - 1 among all the permutations, in lexicographic order
+
+    This is the Lehmer code of the permutation, read as a number in the factorial base. The values smaller than
+    each value that come after it are counted as the smaller values that did not come before it, with a bit mask
+    of the values seen so far.
+
+    :param permutation: The permutation, as a sequence
+    :return: The rank, from 0 to n! - 1
+    """
+    rank = 0
+    seen = 0
+    length = len(permutation)
+    for index, value in enumerate(permutation):
+        rank = rank * (length - index) + value - (seen & ((1 << value) - 1)).bit_count()
+        seen |= 1 << value
+    return rank
+
+
+def unrank_permutation(rank: int, length: int) -> tuple:
+    """ Gets the permutation of 0, 1, ..., length - 1 with a given rank, as computed by rank_permutation()
+
+    :param rank: The rank
+    :param length: The length of the permutation
+    :return: The permutation, as a tuple
+    """
+    digits = []
+    for radix in range(1, length + 1):
+        rank, digit = divmod(rank, radix)
+        digits.append(digit)
+    remaining = list(range(length))
+    return tuple(remaining.pop(digit) for digit in reversed(digits))
+
+
+def relabelled_tiles(state, goal_state) -> list:
+    """ Relabels a state so that its goal becomes the permutation 0, 1, ..., size^2 - 1
+
+    :param state: The PuzzleState
+    :param goal_state: The goal state
+    :return: The index in the goal of every tile of the state, in row-major order
+    """
+    goal_indices = _tile_indices(goal_state.packed, goal_state.size)
+    return [goal_indices[value] for value in state.tiles]
+
+
+def lehmer_digits(permutation) -> list:
+    """ Computes the Lehmer code of a permutation: for every value, the number of smaller values after it
+
+    :param permutation: The permutation, as a sequence
+    :return: The digits, as a list
+    """
+    digits = []
+    seen = 0
+    for value in permutation:
+        digits.append(value - (seen & ((1 << value) - 1)).bit_count())
+        seen |= 1 << value
+    return digits
+
+
+def build_distance_table(size: int) -> bytearray:
+    """ Computes the exact distance to the goal of every state of a size-by-size puzzle
+
+    The goal is taken as the permutation 0, 1, ..., size^2 - 1, so the table holds the distances for any goal
+    once the states are relabelled. The distances are found by a breadth-first search from the goal, one layer
+    at a time; since every swap is its own inverse, the distance from the goal is also the distance to it.
+
+    The table itself records which states were already reached, so only the current and next layers are kept
+    besides it. A swap only changes the Lehmer digits from the first swapped index to the second one, so the rank
+    of every successor is worked out from the digits of its parent instead of from scratch.
+
+    :param size: The size of the puzzle
+    :return: The table of distances, indexed by the rank of the relabelled state
+    """
+    tile_count = size * size
+    moves = _swap_moves(size)
+    # The weight of the digit at every index in the rank
+    weights = [math.factorial(tile_count - 1 - index) for index in range(tile_count)]
+    table = bytearray([UNREACHED]) * math.factorial(tile_count)
+    goal = tuple(range(tile_count))
+    goal_rank = rank_permutation(goal)
+    table[goal_rank] = 0
+    layer = [(goal, goal_rank)]
+    distance = 0
+    while layer:
+        distance += 1
+        next_layer = []
+        for permutation, rank in layer:
+            digits = lehmer_digits(permutation)
+            for first_index, second_index in moves:
+                first_value = permutation[first_index]
+                second_value = permutation[second_index]
+                # The values between the two swapped ones now have the first value after them instead of the second
+                child_rank = rank
+                smaller_than_first = smaller_than_second = 0
+                for index in range(first_index + 1, second_index):
+                    value = permutation[index]
+                    if value < first_value:
+                        smaller_than_first += 1
+                    if value < second_value:
+                        smaller_than_second += 1
+                    child_rank += ((first_value < value) - (second_value < value)) * weights[index]
+                first_digit = digits[second_index] + (first_value < second_value) + smaller_than_second
+                second_digit = digits[first_index] - (second_value < first_value) - smaller_than_first
+                child_rank += ((first_digit - digits[first_index]) * weights[first_index]
+                               + (second_digit - digits[second_index]) * weights[second_index])
+                if table[child_rank] == UNREACHED:
+                    table[child_rank] = distance
+                    child = list(permutation)
+                    child[first_index], child[second_index] = second_value, first_value
+                    next_layer.append((tuple(child), child_rank))
+        layer = next_layer
+    return table
+
+
+class DistanceTable:
+    """Represents the exact distance to the goal of every state of a puzzle size, for any goal state"""
+
+    def __init__(self, size: int, table, buffer=None):
+        self._size = size
+        self._table = table
+        self._buffer = buffer
+
+    @property
+    def size(self):
+        return self._size
+
+    def distance(self, state, goal_state) -> int:
+        """ Looks up the exact number of swaps between a state and a goal state
+
+        :param state: The PuzzleState
+        :param goal_state: The goal state
+        :return: The distance
+        """
+        return self._table[rank_permutation(relabelled_tiles(state, goal_state))]
+
+    def ranks_at_distance(self, distance: int) -> list:
+        """ Gets every relabelled state at a given distance from the goal
+
+        :param distance: The distance
+        :return: The ranks of the relabelled states, as computed by rank_permutation()
+        """
+        return [rank for rank, value in enumerate(self._table) if value == distance]
+
+    def solve(self, start_state, goal_state) -> list:
+        """ Finds an optimal solution path by greedy descent: each step takes a swap that gets one move closer
+
+        :param start_state: The starting PuzzleState
+        :param goal_state: The goal state
+        :return: The solution path, as a list of PuzzleStates
+        """
+        table = self._table
+        moves = _swap_moves(self._size)
+        tiles = relabelled_tiles(start_state, goal_state)
+        distance = table[rank_permutation(tiles)]
+        solution_path = [start_state]
+        while distance > 0:
+            for first_index, second_index in moves:
+                tiles[first_index], tiles[second_index] = tiles[second_index], tiles[first_index]
+                if table[rank_permutation(tiles)] == distance - 1:
+                    break
+                tiles[first_index], tiles[second_index] = tiles[second_index], tiles[first_index]
+            solution_path.append(solution_path[-1]._swap(first_index, second_index))
+            distance -= 1
+        return solution_path
+
+
+def get_table_file(size: int, directory: str = TABLE_DIRECTORY) -> str:
+    """ Gets the path of the file holding the distance table of a given size
+
+    :param size: The size of the puzzle
+    :param directory: The directory the tables are kept in
+    :return: The path to the file
+    """
+    return f'{directory}/distances_{size}x{size}.bin'
+
+
+def build_distance_table_file(size: int, directory: str = TABLE_DIRECTORY) -> str:
+    """ Builds the distance table of a given size and writes it to its file
+
+    The file starts with a small header (magic and size), followed by one byte per state.
+
+    :param size: The size of the puzzle
+    :param directory: The directory the tables are kept in
+    :return: The path to the file
+    """
+    if size > MAX_TABLE_SIZE:
+        raise ValueError(f"Distance tables only go up to {MAX_TABLE_SIZE}x{MAX_TABLE_SIZE} puzzles.")
+    table_file = get_table_file(size, directory)
+    check_or_create_directory(directory)
+
+    # Write to a temporary file first, so other processes never map a half-written table
+    temporary_file = f'{table_file}.{os.getpid()}.tmp'
+    with open(temporary_file, 'wb') as file:
+        file.write(_MAGIC + bytes([size]))
+        file.write(build_distance_table(size))
+    os.replace(temporary_file, table_file)
+    return table_file
+
+
+def load_distance_table(table_file: str) -> DistanceTable:
+    """ Maps a distance table file into memory
+
+    The file is mapped read-only, so every process that loads it shares the same pages.
+
+    :param table_file: The path to the file
+    :return: The DistanceTable
+    """
+    with open(table_file, 'rb') as file:
+        buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    if buffer[:4] != _MAGIC:
+        raise ValueError(f"{table_file} is not a distance table file.")
+    size = buffer[4]
+    return DistanceTable(size, memoryview(buffer)[_HEADER_LENGTH:], buffer)
+
+
+def get_distance_table(size: int, directory: str = TABLE_DIRECTORY) -> DistanceTable:
+    """ Gets the distance table of a given size, loading or building it if needed
+
+    :param size: The size of the puzzle
+    :param directory: The directory the tables are kept in
+    :return: The DistanceTable
+    """
+    table = _tables.get(size)
+    if table is None:
+        table_file = get_table_file(size, directory)
+        if not os.path.isfile(table_file):
+            build_distance_table_file(size, directory)
+        table = load_distance_table(table_file)
+        _tables[size] = table
+    return table
+
+
+def distance_table_solve(start_state, goal_state) -> SearchResult:
+    """ Solves a puzzle optimally with the distance table of its size
+
+    :param start_state: The starting PuzzleState
+    :param goal_state: The goal state
+    :return: The solution path, an empty search path and the elapsed time, as a SearchResult
+    """
+    start_time = time.perf_counter()
+    solution_path = get_distance_table(start_state.size).solve(start_state, goal_state)
+    return SearchResult(solution_path, [], time.perf_counter() - start_time)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Builds the exact distance table of a puzzle size.")
+    parser.add_argument('--size', type=int, default=MAX_TABLE_SIZE, help="the size of the puzzle")
+    parser.add_argument('--directory', default=TABLE_DIRECTORY, help="the directory to write the table to")
+    arguments = parser.parse_args()
+
+    print(build_distance_table_file(arguments.size, arguments.directory))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,8 +1,15 @@
 from puzzle_state import PuzzleState
 from random import shuffle
+from functools import lru_cache
+import math
 import re
 import os
 
+# Splits a state around its numbers, keeping them
+_STATE_NUMBERS = re.compile(r'(\d+)')
+# Turns what is left between the numbers into the shape of the state
+_STATE_SHAPE = str.maketrans('[]', '()', ' \t\r\n')
+
 
 def create_random_puzzle(size: int) -> PuzzleState:
     """ Creates a random puzzle.
@@ -78,13 +85,18 @@ def create_tuple_of_tuples_of_numbers(list_of_possible_numbers: list, size: int)
             range(0, len(list_of_possible_numbers), size)])
 
 
-def get_all_puzzles() -> list:
-    """ Gets all the puzzles in the appropriate file and returns them
+def get_all_puzzles(puzzle_file: str = '../input/input_puzzles.txt'):
+    """ Gets all the puzzles in the appropriate file, one line at a time
+
+    The file is read lazily, so it is never held in memory as a whole. Blank lines are skipped.
 
-    :return: All the puzzles as a list strings
+    :param puzzle_file: The path to the file. Default is the input_puzzles.txt file of the input directory.
+    :return: A generator of the puzzles, as strings
     """
-    with open('../input/input_puzzles.txt', 'r') as file:
-        return file.readlines()
+    with open(puzzle_file, 'rt') as file:
+        for line in file:
+            if not line.isspace():
+                yield line
 
 
 def get_goal_state() -> str:
@@ -96,24 +108,41 @@ def get_goal_state() -> str:
         return file.readline()
 
 
-def read_state(state: str) -> tuple:
+def read_state(state: str, size: int = None) -> tuple:
     """ Reads a given PuzzleState as a string and returns it as a proper tuple
 
+    The string is split around its numbers in a single pass. What is left around the numbers (the brackets and
+    commas, without the spaces) is the shape of the state, which is checked against the shape of a size-by-size state
+    with a single comparison, so a missing or extra comma is rejected too. Tuples and lists are both accepted.
+
+    The tiles must be numbered from 1 to size^2, since that is how a PuzzleState is packed. Other labels, such as
+    tiles numbered from 0, are rejected with a ValueError.
+
     :param state: The PuzzleState as a string from the file
+    :param size: The size the PuzzleState must have, such as the size of the other puzzles of the file.
+                 Default is None, for any square size.
     :return: The tuple representation of that PuzzleState
     """
-    new_state = '(' + state.lstrip("(").rstrip(')\n') + ')'
-
-    list_of_strings = re.findall('\((?:\d+,\s)+\d+\)', new_state)
+    parts = _STATE_NUMBERS.split(state)
+    numbers = list(map(int, parts[1::2]))
+    row_length = size if size is not None else math.isqrt(len(numbers))
+    if '|'.join(parts[0::2]).translate(_STATE_SHAPE) != _state_shape(row_length):
+        expected = "a square" if size is None else f"a {size}-by-{size}"
+        raise ValueError(f"{state.strip()} is not {expected} puzzle.")
+    if sorted(numbers) != list(range(1, len(numbers) + 1)):
+        raise ValueError(f"{state.strip()} must hold each tile from 1 to {len(numbers)} exactly once.")
+    return tuple(tuple(numbers[index:index + row_length]) for index in range(0, len(numbers), row_length))
 
-    list_to_return = []
 
-    for string in list_of_strings:
-        list_of_nums = [int(x) for x in re.findall('\d+',string)]
-        tup = tuple(list_of_nums)
-        list_to_return.append(tup)
+@lru_cache(maxsize=None)
+def _state_shape(size: int) -> str:
+    """ Gets the shape of a size-by-size state, as checked by read_state()
 
-    return tuple(list_to_return)
+    :param size: The size of the puzzle
+    :return: The shape: the brackets and commas of the state, with a | in place of every number
+    """
+    row = '(' + ','.join('|' * size) + ')'
+    return '(' + ','.join([row] * size) + ')'
 
 
 def print_solution_path(solution_path: list) -> None:
@@ -142,13 +171,14 @@ def testing() -> None:
     state = PuzzleState(((1, 2, 3), (4, 5, 6), (7, 8, 9)))
     goal = PuzzleState(((2, 1, 3), (9, 6, 4), (7, 8, 5)))
     assert PuzzleState.hamming_distance(state, goal) == 6
-    assert PuzzleState.manhattan_distance(state, goal) == 10
+    # The modified Manhattan distance is halved, since a swap moves two tiles
+    assert PuzzleState.manhattan_distance(state, goal) == 5
     assert PuzzleState.sum_permutation(state, goal) == 10
 
     state = PuzzleState(((1, 2), (3, 4)))
     goal = PuzzleState(((4, 3), (1, 2)))
     assert PuzzleState.hamming_distance(state, goal) == 4
-    assert PuzzleState.manhattan_distance(state, goal) == 6
+    assert PuzzleState.manhattan_distance(state, goal) == 3
     assert PuzzleState.sum_permutation(state, goal) == 5
 
     # Test A* using all heuristics
@@ -160,7 +190,7 @@ def testing() -> None:
 
     for heuristic in heuristics:
         print(heuristic.__name__, "path")
-        search_list = PuzzleState.a_star(start_state, goal_state, heuristic, time_limit)
+        search_list = PuzzleState.a_star(start_state, goal_state, heuristic, time_limit).solution_path
 
         for index, state in enumerate(search_list):
             print(state, state.level)
@@ -181,19 +211,72 @@ def output_to_files(puzzle_type: str, puzzle_number: int,
     :param heuristic: The heuristic name, if given. Assumed None
     :return: None
     """
+    search_file, solution_file = get_output_files(puzzle_type, puzzle_number, heuristic)
+
+    # Write Search File
+    write_to_search_file(search_file, search_path, elapsed)
+
+    # Write Solution File
+    write_to_solution_file(solution_file, solution_path, elapsed)
+
+
+def get_output_files(puzzle_type: str, puzzle_number: int, heuristic=None) -> tuple:
+    """ Gets the search and solution files of a puzzle, creating their directories if needed
+
+    :param puzzle_type: The type of puzzle which is being processed. Possible values = ["A_Star", "DFS", "Iter_Deepening"]
+    :param puzzle_number: The number of the puzzle being processed. From 1 to 20 normally.
+    :param heuristic: The heuristic name, if given. Assumed None
+    :return: The search path and solution path as a tuple of strings
+    """
     directory = f'../output/{puzzle_type}/{puzzle_type}_Puzzle_{puzzle_number}'
 
     check_or_create_directory(directory)
 
-    search_file, solution_file = get_search_and_solution_directories(directory, heuristic)
+    return get_search_and_solution_directories(directory, heuristic)
+
+
+def output_iterations_to_files(puzzle_type: str, puzzle_number: int,
+                               iteration_counts: list, solution_path: list,
+                               elapsed: float, heuristic=None) -> None:
+    """ Outputs the solution path and the per-iteration node counts for each completed puzzle to appropriate files
+
+    Used instead of output_to_files() by algorithms that do not keep their search path, like IDA*.
+
+    :param puzzle_type: The type of puzzle which is being processed. Possible values = ["A_Star", "DFS", "Iter_Deepening"]
+    :param puzzle_number: The number of the puzzle being processed. From 1 to 20 normally.
+    :param iteration_counts: The (threshold, number of nodes expanded) of every iteration
+    :param solution_path: The solution path
+    :param elapsed: The number of seconds the algorithm ran for. Highest value normally around 60 seconds
+    :param heuristic: The heuristic name, if given. Assumed None
+    :return: None
+    """
+    search_file, solution_file = get_output_files(puzzle_type, puzzle_number, heuristic)
 
     # Write Search File
-    write_to_search_file(search_file, search_path, elapsed)
+    write_to_iteration_file(search_file, iteration_counts, elapsed)
 
     # Write Solution File
     write_to_solution_file(solution_file, solution_path, elapsed)
 
 
+def write_to_iteration_file(search_file: str, iteration_counts: list, elapsed: float) -> None:
+    """ Writes the number of nodes expanded in each iteration to the search file, per puzzle
+
+    :param search_file: The path to the file to write to
+    :param iteration_counts: The (threshold, number of nodes expanded) of every iteration
+    :param elapsed: The number of seconds the algorithm ran for. Highest value normally around 60 seconds
+    :return: None
+    """
+    with open(search_file, 'wt') as file:
+        file.write("Search Iterations:\n")
+        if not iteration_counts:
+            file.write("no solution")
+        else:
+            for index, (threshold, expanded) in enumerate(iteration_counts, 1):
+                file.write('Iteration: ' + str(index) + ' Threshold: ' + str(threshold) + ' Expanded: ' + str(expanded) + '\n')
+            file.write("Time taken: " + str(elapsed))
+
+
 def write_to_solution_file(solution_file: str, solution_path: str, elapsed: float) -> None:
     """ Writes the solution path to its relevant file, per puzzle
 
@@ -250,6 +333,10 @@ def get_search_and_solution_directories(directory: str, heuristic: str) -> tuple
             sum_directory = directory + '/Sum_Permutation'
             check_or_create_directory(sum_directory)
             return sum_directory + '/Search_Path.txt', sum_directory + '/Solution_Path.txt'
+        elif heuristic == "pattern_database_distance":
+            pattern_directory = directory + '/Pattern_Database'
+            check_or_create_directory(pattern_directory)
+            return pattern_directory + '/Search_Path.txt', pattern_directory + '/Solution_Path.txt'
     return directory + '/Search_Path.txt', directory + '/Solution_Path.txt'
 
 
@@ -340,3 +427,16 @@ def print_data(length_solution, length_search, execution_time, nb_no_solution: i
         print(f"Total execution time: {total_exec_time}")
 
     print(f"Total number of no solution: {nb_no_solution}\n")
+
+
+def print_search_stats(stats) -> None:
+    """ Prints the counters, and the phase times if they were measured, of a search to the console
+
+    :param stats: The SearchStats to print, or None if there are none
+    :return: None
+    """
+    if stats is None:
+        return
+    for line in stats.summary():
+        print(line)
+    print()
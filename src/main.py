@@ -1,71 +1,109 @@
 
 from functions import *
+from batch import Job, run_jobs, aggregate_results, merge_stats
+from pattern_database import PatternDatabaseHeuristic, DEFAULT_GROUP_SIZE, DATABASE_DIRECTORY
+from search_budget import SearchBudget
+from distance_table import get_distance_table, MAX_TABLE_SIZE
+from puzzle_file import PuzzleFile
+import os
+
+# The estimated memory all the searches of a batch can use together, in bytes
+MEMORY_LIMIT = 4 << 30
+# The pattern database heuristic of the A* tests. Use the same group size and directory as pattern_database.py to
+# use the databases it builds.
+PATTERN_DATABASE = PatternDatabaseHeuristic(DEFAULT_GROUP_SIZE, DATABASE_DIRECTORY)
 
 
 def main():
     create_20_random_puzzles()
     goal_state = read_state(get_goal_state())
-    puzzles = [read_state(x) for x in get_all_puzzles()]
+    # Read the puzzles again for every test, instead of keeping them all in memory
+    puzzles = PuzzleFile('../input/input_puzzles.txt')
     time_limit = 60
-
-    test_Astar_on_puzzles(goal_state, puzzles, time_limit)
-    test_dfs_on_puzzles(goal_state, puzzles, time_limit)
-    test_iter_deepening_on_puzzles(goal_state, puzzles, 100, time_limit)
+    workers = os.cpu_count() or 1
+    # Every worker gets its share of MEMORY_LIMIT, so a large batch cannot run the machine out of memory
+    budget = SearchBudget(time_limit, max_memory=MEMORY_LIMIT // workers)
+
+    test_Astar_on_puzzles(goal_state, puzzles, time_limit, workers, budget=budget)
+    test_bidirectional_on_puzzles(goal_state, puzzles, time_limit, workers, budget=budget)
+    test_dfs_on_puzzles(goal_state, puzzles, time_limit, workers, budget=budget)
+    test_iter_deepening_on_puzzles(goal_state, puzzles, 100, time_limit, workers=workers, budget=budget)
+    for heuristic in [PuzzleState.sum_permutation, PuzzleState.hamming_distance, PuzzleState.manhattan_distance]:
+        test_iter_deepening_on_puzzles(goal_state, puzzles, 100, time_limit, heuristic, workers, budget=budget)
+    if len(goal_state) <= MAX_TABLE_SIZE:
+        test_distance_table_on_puzzles(goal_state, puzzles, workers)
 
     # testing()
 
 
-def test_Astar_on_puzzles(goal: tuple, puzzles: list, time_limit) -> None:
-    """ Runs the A* algorithm on all puzzles using each heuristic.
+def print_result(result) -> None:
+    """ Prints the outcome of a single puzzle, as soon as it is solved
 
-    The heuristics we use are: sum permutation, Hamming distance, and a
-    modified version of the Manhattan distance.
+    :param result: The JobResult of the puzzle
+    :return: None
+    """
+    job = result.job
+    if job.heuristic is not None:
+        print("\nPuzzle", job.puzzle_number, job.puzzle, job.heuristic.__name__)
+    else:
+        print("\nPuzzle", job.puzzle_number, job.puzzle)
+
+    if not result.solved:
+        if result.exceeded is not None:
+            print("no solution, the", result.exceeded, "budget was exceeded")
+        else:
+            print("no solution")
+    else:
+        if result.iteration_counts is not None:
+            print("Nodes expanded per iteration: " + str([expanded for _, expanded in result.iteration_counts]))
+        if result.improvements is not None:
+            for length, weight, bound, elapsed in result.improvements:
+                print(f"Weight {weight}: solution of length {length}, at most {bound:.3f} times the optimal, "
+                      f"after {elapsed:.3f} s")
+        print("Time taken: " + str(result.elapsed))
+
+
+def run_and_group_by_heuristic(jobs, workers: int) -> dict:
+    """ Runs the given Jobs, printing each result as it comes in, and groups the results by heuristic
+
+    :param jobs: The Jobs to run
+    :param workers: The number of worker processes
+    :return: The JobResults of each heuristic, as a dict
+    """
+    results = {}
+    for result in run_jobs(jobs, workers):
+        print_result(result)
+        results.setdefault(result.job.heuristic, []).append(result)
+    return results
+
+
+def run_with_each_heuristic(puzzle_type: str, algorithm: str, goal: tuple, puzzles: list, time_limit, workers: int,
+                            **job_options) -> None:
+    """ Runs a best-first algorithm on all puzzles using each A* heuristic, and prints the data of each heuristic
+
+    The heuristics we use are: sum permutation, Hamming distance, a
+    modified version of the Manhattan distance, and an additive pattern database.
+    :param puzzle_type: The name of the output directory of the algorithm
+    :param algorithm: The name of the algorithm, as solved by a Job
     :param goal: The goal state
     :param puzzles: All the puzzles being solved
+    :param time_limit: The time limit of every search
+    :param workers: The number of worker processes to solve the puzzles with
+    :param job_options: The other fields of every Job, such as trace, budget or weight
     :return: None
     """
-    print("------------")
-    print("A* ALGORITHM")
-    print("------------")
+    heuristics = [PuzzleState.sum_permutation, PuzzleState.hamming_distance, PuzzleState.manhattan_distance,
+                  PATTERN_DATABASE]
+    # Build the pattern database once here, instead of in every worker
+    PATTERN_DATABASE.build(PuzzleState(goal))
+    jobs = (Job(puzzle_type, algorithm, heuristic, idx, puzzle, goal, time_limit, **job_options)
+            for heuristic in heuristics
+            for idx, puzzle in enumerate(puzzles, 1))
+    results = run_and_group_by_heuristic(jobs, workers)
 
-    heuristics = [PuzzleState.sum_permutation, PuzzleState.hamming_distance, PuzzleState.manhattan_distance]
     for heuristic in heuristics:
-
-        length_solution = []
-        length_search = []
-        nb_no_solution = 0
-        search_cost = []
-        solution_cost = []
-        execution_time = []
-
-        print(heuristic.__name__, "path")
-        for idx, puzzle in enumerate(puzzles, 1):
-            print("\nPuzzle", idx, puzzle)
-            start = puzzle
-
-            start_state = PuzzleState(start, 0)
-            goal_state = PuzzleState(goal, 0)
-            solution_path, search_path, elapsed = PuzzleState.a_star(start_state, goal_state, heuristic, time_limit)
-
-            output_to_files("A_Star", idx, search_path, solution_path, elapsed, heuristic=heuristic.__name__)
-
-            if elapsed > time_limit:
-                nb_no_solution += 1
-                print("no solution")
-            else:
-                length_search.append(len(search_path))
-                length_solution.append(len(solution_path))
-                execution_time.append(elapsed)
-                total_search = 0
-                for node in search_path:
-                    total_search += node.get_f_value()[0]
-                total_sol = 0
-                for node in solution_path:
-                    total_sol += node.get_f_value()[0]
-                search_cost.append(total_search)
-                solution_cost.append(total_sol)
-
-                print("Time taken: " + str(elapsed))
+        (length_solution, length_search, solution_cost,
+         search_cost, execution_time, nb_no_solution) = aggregate_results(results.get(heuristic, []))
 
         print_astar_data(heuristic,
                          length_solution,
@@ -74,88 +112,238 @@ def test_Astar_on_puzzles(goal: tuple, puzzles: list, time_limit) -> None:
                          search_cost,
                          execution_time,
                          nb_no_solution)
+        print_search_stats(merge_stats(results.get(heuristic, [])))
 
 
-def test_dfs_on_puzzles(goal: tuple, puzzles: list, time_limit) -> None:
-    """ Runs the DFS algorithm on all puzzles
+def test_Astar_on_puzzles(goal: tuple, puzzles: list, time_limit, workers: int = 1, trace: bool = False,
+                          budget=None, cache: bool = False, max_nodes: int = None, weight: float = 1) -> None:
+    """ Runs the A* algorithm on all puzzles using each heuristic.
 
+    The heuristics we use are: sum permutation, Hamming distance, a
+    modified version of the Manhattan distance, and an additive pattern database.
+    If max_nodes is given, runs the memory-bounded SMA* algorithm instead.
+    If weight is above 1, runs weighted A* instead, whose solutions are at most weight times as long as the optimal.
     :param goal: The goal state
     :param puzzles: All the puzzles being solved
+    :param workers: The number of worker processes to solve the puzzles with. Default is 1.
+    :param trace: Whether to stream the search paths to binary trace files instead of text files. Default is False.
+    :param budget: The SearchBudget of every search, replacing time_limit. Default is None.
+    :param cache: Whether to reuse the solutions stored in the solution cache, and store the new ones. Default is False.
+                  Not used by SMA*.
+    :param max_nodes: The maximum number of nodes SMA* keeps in memory. Default is None, to run A*.
+    :param weight: The weight of the heuristic. Default is 1, for plain A*.
     :return: None
     """
-    print("----------------------------")
-    print("DEPTH-FIRST SEARCH ALGORITHM")
-    print("----------------------------")
+    if max_nodes is None and weight != 1:
+        print("---------------------")
+        print("WEIGHTED A* ALGORITHM")
+        print("---------------------")
+    elif max_nodes is None:
+        print("------------")
+        print("A* ALGORITHM")
+        print("------------")
+    else:
+        print("--------------")
+        print("SMA* ALGORITHM")
+        print("--------------")
+
+    if max_nodes is None:
+        puzzle_type = "A_Star" if weight == 1 else "Weighted_A_Star"
+        run_with_each_heuristic(puzzle_type, 'a_star', goal, puzzles, time_limit, workers, trace=trace, budget=budget,
+                                cache=cache, weight=weight)
+    else:
+        run_with_each_heuristic("SMA_Star", 'sma_star', goal, puzzles, time_limit, workers, trace=trace,
+                                budget=budget, max_nodes=max_nodes)
+
+
+def test_anytime_Astar_on_puzzles(goal: tuple, puzzles: list, time_limit, workers: int = 1, trace: bool = False,
+                                  budget=None, initial_weight: float = 3) -> None:
+    """ Runs the anytime A* (ARA*) algorithm on all puzzles using each heuristic.
+
+    Every improved solution of a puzzle is printed with its bound, and written over its solution file.
+    :param goal: The goal state
+    :param puzzles: All the puzzles being solved
+    :param workers: The number of worker processes to solve the puzzles with. Default is 1.
+    :param trace: Whether to stream the search paths to binary trace files instead of text files. Default is False.
+    :param budget: The SearchBudget of every search, replacing time_limit. Default is None.
+    :param initial_weight: The weight of the heuristic in the first search. Default is 3.
+    :return: None
+    """
+    print("--------------------")
+    print("ANYTIME A* ALGORITHM")
+    print("--------------------")
 
-    length_solution = []
-    length_search = []
-    nb_no_solution = 0
-    execution_time = []
+    run_with_each_heuristic("Anytime_A_Star", 'anytime_a_star', goal, puzzles, time_limit, workers, trace=trace,
+                            budget=budget, weight=initial_weight)
 
-    for idx, puzzle in enumerate(puzzles, 1):
-        print("\nPuzzle", idx, puzzle)
-        start = puzzle
 
-        start_state = PuzzleState(start, 0)
-        goal_state = PuzzleState(goal, 0)
+def test_greedy_on_puzzles(goal: tuple, puzzles: list, time_limit, workers: int = 1, trace: bool = False,
+                           budget=None, beam_width: int = None) -> None:
+    """ Runs the greedy best-first search on all puzzles using each heuristic.
 
-        dfs_solution_path, dfs_search_path, elapsed = PuzzleState.depth_first_search(start_state, goal_state, time_limit)
-        
-        output_to_files("DFS", idx, dfs_search_path, dfs_solution_path, elapsed)
+    These searches find a solution quickly on boards that are too large for A*, with no bound on its length.
+    If beam_width is given, runs beam search instead, keeping only beam_width states per layer.
+    :param goal: The goal state
+    :param puzzles: All the puzzles being solved
+    :param workers: The number of worker processes to solve the puzzles with. Default is 1.
+    :param trace: Whether to stream the search paths to binary trace files instead of text files. Default is False.
+    :param budget: The SearchBudget of every search, replacing time_limit. Default is None.
+    :param beam_width: The number of states beam search keeps in each layer. Default is None, to run greedy
+                       best-first search.
+    :return: None
+    """
+    if beam_width is None:
+        print("----------------------------------")
+        print("GREEDY BEST-FIRST SEARCH ALGORITHM")
+        print("----------------------------------")
+    else:
+        print("---------------------")
+        print("BEAM SEARCH ALGORITHM")
+        print("---------------------")
+
+    if beam_width is None:
+        run_with_each_heuristic("Greedy_Best_First", 'greedy_best_first', goal, puzzles, time_limit, workers,
+                                trace=trace, budget=budget)
+    else:
+        run_with_each_heuristic("Beam_Search", 'beam_search', goal, puzzles, time_limit, workers, trace=trace,
+                                budget=budget, beam_width=beam_width)
+
+
+def test_bidirectional_on_puzzles(goal: tuple, puzzles: list, time_limit, workers: int = 1,
+                                  trace: bool = False, budget=None) -> None:
+    """ Runs the bidirectional search on all puzzles, first breadth-first and then with each heuristic.
 
-        if elapsed > time_limit:
-            nb_no_solution += 1
-            print("no solution")
+    :param goal: The goal state
+    :param puzzles: All the puzzles being solved
+    :param workers: The number of worker processes to solve the puzzles with. Default is 1.
+    :param trace: Whether to stream the search paths to binary trace files instead of text files. Default is False.
+    :param budget: The SearchBudget of every search, replacing time_limit. Default is None.
+    :return: None
+    """
+    print("------------------------------")
+    print("BIDIRECTIONAL SEARCH ALGORITHM")
+    print("------------------------------")
+
+    heuristics = [None, PuzzleState.sum_permutation, PuzzleState.hamming_distance, PuzzleState.manhattan_distance]
+    jobs = (Job("Bidirectional", 'bidirectional_search', heuristic, idx, puzzle, goal, time_limit, trace=trace,
+                budget=budget)
+            for heuristic in heuristics
+            for idx, puzzle in enumerate(puzzles, 1))
+    results = run_and_group_by_heuristic(jobs, workers)
+
+    for heuristic in heuristics:
+        (length_solution, length_search, solution_cost,
+         search_cost, execution_time, nb_no_solution) = aggregate_results(results.get(heuristic, []))
+
+        if heuristic is None:
+            print(f"---Bidirectional breadth_first data---")
+            print_data(length_solution, length_search, execution_time, nb_no_solution)
         else:
-            length_search.append(len(dfs_search_path))
-            length_solution.append(len(dfs_solution_path))
-            execution_time.append(elapsed)
+            print_astar_data(heuristic,
+                             length_solution,
+                             length_search,
+                             solution_cost,
+                             search_cost,
+                             execution_time,
+                             nb_no_solution)
+        print_search_stats(merge_stats(results.get(heuristic, [])))
+
+
+def test_dfs_on_puzzles(goal: tuple, puzzles: list, time_limit, workers: int = 1, trace: bool = False,
+                        budget=None, cache: bool = False) -> None:
+    """ Runs the DFS algorithm on all puzzles
+
+    :param goal: The goal state
+    :param puzzles: All the puzzles being solved
+    :param workers: The number of worker processes to solve the puzzles with. Default is 1.
+    :param trace: Whether to stream the search paths to binary trace files instead of text files. Default is False.
+    :param budget: The SearchBudget of every search, replacing time_limit. Default is None.
+    :param cache: Whether to reuse the solutions stored in the solution cache, and store the new ones. Default is False.
+    :return: None
+    """
+    print("----------------------------")
+    print("DEPTH-FIRST SEARCH ALGORITHM")
+    print("----------------------------")
 
-            print("Time taken: " + str(elapsed))
+    jobs = (Job("DFS", 'depth_first_search', None, idx, puzzle, goal, time_limit, trace=trace, budget=budget,
+                cache=cache)
+            for idx, puzzle in enumerate(puzzles, 1))
+    results = run_and_group_by_heuristic(jobs, workers)
+
+    length_solution, length_search, _, _, execution_time, nb_no_solution = aggregate_results(results.get(None, []))
 
     print(f"---DFS data---")
     print_data(length_solution, length_search, execution_time, nb_no_solution)
+    print_search_stats(merge_stats(results.get(None, [])))
 
 
-def test_iter_deepening_on_puzzles(goal: tuple, puzzles: list, max_depth: int, time_limit) -> None:
+def test_iter_deepening_on_puzzles(goal: tuple, puzzles: list, max_depth: int, time_limit, heuristic=None,
+                                   workers: int = 1, trace: bool = False, budget=None, cache: bool = False) -> None:
     """ Runs the DFS algorithm with iterative deepening on all puzzles
 
+    If a heuristic is given, runs IDA* with that heuristic instead.
+
     :param goal: The goal state
     :param puzzles: All the puzzles being solved
-    :param max_depth: The maximum depth to search to before concluding that there is no solution
+    :param max_depth: The maximum depth to search to before concluding that there is no solution. For IDA*, this is
+                      the maximum f value instead.
+    :param heuristic: The heuristic to use for IDA*, if given. Assumed None
+    :param workers: The number of worker processes to solve the puzzles with. Default is 1.
+    :param trace: Whether to stream the search paths to binary trace files instead of text files. Default is False.
+    :param budget: The SearchBudget of every search, replacing time_limit. Default is None.
+    :param cache: Whether iterative deepening reuses the solutions stored in the solution cache, and stores the
+                  new ones. Default is False.
     :return: None
     """
-    print("-----------------------------")
-    print("ITERATIVE DEEPENING ALGORITHM")
-    print("-----------------------------")
+    if heuristic is None:
+        print("-----------------------------")
+        print("ITERATIVE DEEPENING ALGORITHM")
+        print("-----------------------------")
+    else:
+        print("--------------")
+        print("IDA* ALGORITHM")
+        print("--------------")
+        print(heuristic.__name__, "path")
 
-    length_solution = []
-    length_search = []
-    nb_no_solution = 0
-    execution_time = []
+    algorithm = 'iterative_deepening' if heuristic is None else 'ida_star'
+    jobs = (Job("Iter_Deepening", algorithm, heuristic, idx, puzzle, goal, time_limit, max_depth, trace,
+                budget, cache)
+            for idx, puzzle in enumerate(puzzles, 1))
+    results = run_and_group_by_heuristic(jobs, workers)
 
-    for idx, puzzle in enumerate(puzzles, 1):
-        print("\nPuzzle", idx, puzzle)
-        start = puzzle
+    length_solution, length_search, _, _, execution_time, nb_no_solution = aggregate_results(results.get(heuristic, []))
 
-        start_state = PuzzleState(start, 0)
-        goal_state = PuzzleState(goal, 0)
+    if heuristic is None:
+        print(f"---Iterative Deepening data---")
+    else:
+        print(f"---IDA* {heuristic.__name__} data---")
+    print_data(length_solution, length_search, execution_time, nb_no_solution)
+    print_search_stats(merge_stats(results.get(heuristic, [])))
 
-        iter_solution_path, iter_search_path, elapsed = PuzzleState.iterative_deepening(start_state, goal_state, max_depth, time_limit)
 
-        output_to_files("Iter_Deepening", idx, iter_search_path, iter_solution_path, elapsed)
+def test_distance_table_on_puzzles(goal: tuple, puzzles: list, workers: int = 1) -> None:
+    """ Solves all puzzles optimally with the exact distance table of their size
 
-        if elapsed > time_limit:
-            nb_no_solution += 1
-            print("no solution")
-        else:
-            length_search.append(len(iter_search_path))
-            length_solution.append(len(iter_solution_path))
-            execution_time.append(elapsed)
+    The table is built the first time it is used, and then loaded from its file.
+
+    :param goal: The goal state
+    :param puzzles: All the puzzles being solved
+    :param workers: The number of worker processes to solve the puzzles with. Default is 1.
+    :return: None
+    """
+    print("--------------")
+    print("DISTANCE TABLE")
+    print("--------------")
+
+    # Build the table once here, instead of in every worker
+    get_distance_table(len(goal))
+    jobs = (Job("Distance_Table", 'distance_table', None, idx, puzzle, goal, None)
+            for idx, puzzle in enumerate(puzzles, 1))
+    results = run_and_group_by_heuristic(jobs, workers)
 
-            print("Time taken: " + str(elapsed))
+    length_solution, length_search, _, _, execution_time, nb_no_solution = aggregate_results(results.get(None, []))
 
-    print(f"---Iterative Deepening data---")
+    print(f"---Distance table data---")
     print_data(length_solution, length_search, execution_time, nb_no_solution)
 
 
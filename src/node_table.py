@@ -0,0 +1,198 @@
+from array import array
+
+# The parent index of the root node
+NO_PARENT = -1
+
+
+class NodeTable:
+    """The nodes of a search, stored in parallel arrays instead of as PuzzleStates
+
+    It can be used in place of a list of PuzzleStates: iterating over it, or indexing it, creates the PuzzleStates
+    of its nodes, in the order they were added.
+
+    Each node takes its packed state, its g value, its h value, the index of the swap that produced it in the swap
+    table and the index of its parent node: a few dozen bytes, and no references to other objects. PuzzleStates are
+    only created when a node is looked at, and solution paths are rebuilt by replaying the swaps from the start
+    state, so a node that is discarded by the search is freed at once, and its ancestors are only kept as indices.
+
+    Packed states are stored as unsigned 64-bit integers until one does not fit (from 5x5 puzzles up), and then
+    as Python ints.
+    """
+
+    __slots__ = ('_start_state', '_moves', '_move_indices', '_weight', '_packed', '_levels', '_h_values',
+                 '_integral_h', '_moves_made', '_parents')
+
+    def __init__(self, start_state, moves: tuple, weight=None):
+        """ Creates an empty table
+
+        :param start_state: The starting PuzzleState, which solution paths are replayed from
+        :param moves: The swap table of the puzzle size, as pairs of row-major indices
+        :param weight: The weight of the h values in the f values of the PuzzleStates. Default is None, for nodes
+                       without h values, whose PuzzleStates keep an f value of 0.
+        """
+        self._start_state = start_state
+        self._moves = moves
+        self._move_indices = {move: index for index, move in enumerate(moves)}
+        self._weight = weight
+        self._packed = array('Q')
+        self._levels = array('l')
+        # Only filled in when there is a weight. While every h value is an int, they are given back as ints.
+        self._h_values = array('d')
+        self._integral_h = True
+        self._moves_made = array('h')
+        self._parents = array('q')
+
+    def __len__(self):
+        return len(self._levels)
+
+    def __iter__(self):
+        for index in range(len(self._levels)):
+            yield self.state(index)
+
+    def __getitem__(self, index: int):
+        return self.state(range(len(self._levels))[index])
+
+    def add(self, state, parent: int = NO_PARENT) -> int:
+        """ Adds a node for a PuzzleState
+
+        :param state: The PuzzleState, whose _swapped is the swap that produced it from the parent node
+        :param parent: The index of the parent node. Default is NO_PARENT, for the root, or for a node whose path
+                       is never rebuilt.
+        :return: The index of the new node
+        """
+        try:
+            self._packed.append(state._packed)
+        except OverflowError:
+            self._packed = list(self._packed)
+            self._packed.append(state._packed)
+        self._levels.append(state._level)
+        if self._weight is not None:
+            self._add_h_value(state._f_value[1])
+        if parent == NO_PARENT:
+            self._moves_made.append(-1)
+        else:
+            self._moves_made.append(self._move_indices[state._swapped])
+        parents = self._parents
+        parents.append(parent)
+        return len(parents) - 1
+
+    def append(self, state) -> None:
+        """ Adds a node without a parent, so the table can be used as a list of PuzzleStates, like a closed list
+
+        :param state: The PuzzleState
+        :return: None
+        """
+        try:
+            self._packed.append(state._packed)
+        except OverflowError:
+            self._packed = list(self._packed)
+            self._packed.append(state._packed)
+        self._levels.append(state._level)
+        if self._weight is not None:
+            self._add_h_value(state._f_value[1])
+        self._moves_made.append(-1)
+        self._parents.append(NO_PARENT)
+
+    def _add_h_value(self, h_value) -> None:
+        """ Stores the h value of a new node
+
+        :param h_value: The h value
+        :return: None
+        """
+        self._h_values.append(h_value)
+        if self._integral_h and h_value.__class__ is not int:
+            self._integral_h = False
+
+    def _f_value(self, index: int, level: int) -> tuple:
+        """ Gets the f value of a node, as set by PuzzleState.set_f_value()
+
+        :param index: The index of the node
+        :param level: The g value of the node
+        :return: The f value and the h value, as a tuple
+        """
+        h_value = self._h_values[index]
+        if self._integral_h:
+            h_value = int(h_value)
+        return h_value * self._weight + level, h_value
+
+    def packed(self, index: int) -> int:
+        """ Gets the packed state of a node
+
+        :param index: The index of the node
+        :return: The packed state
+        """
+        return self._packed[index]
+
+    def level(self, index: int) -> int:
+        """ Gets the g value of a node
+
+        :param index: The index of the node
+        :return: The g value
+        """
+        return self._levels[index]
+
+    def state(self, index: int):
+        """ Creates the PuzzleState of a node, without its parent
+
+        :param index: The index of the node
+        :return: The PuzzleState, with its level, f value and last swap
+        """
+        move = self._moves_made[index]
+        state = self._start_state._from_packed(self._packed[index], self._start_state.size, self._levels[index],
+                                               None, self._moves[move] if move >= 0 else None)
+        if self._weight is not None:
+            state._f_value = self._f_value(index, state._level)
+        return state
+
+    def path(self, index: int) -> list:
+        """ Rebuilds the path from the start state to a node by replaying its swaps
+
+        :param index: The index of the node
+        :return: The path, as a list of PuzzleStates linked to their parents, with the f values of their nodes
+        """
+        indices = []
+        while index != NO_PARENT:
+            indices.append(index)
+            index = self._parents[index]
+        indices.reverse()
+
+        path_list = [self._start_state]
+        for index in indices[1:]:
+            path_list.append(path_list[-1]._swap(*self._moves[self._moves_made[index]]))
+        if self._weight is not None:
+            for state, index in zip(path_list, indices):
+                state._f_value = self._f_value(index, state._level)
+        return path_list
+
+
+class NodeList:
+    """A list of the nodes of a NodeTable, such as the closed list of a search, which stores their indices
+
+    It can be used in place of a list of PuzzleStates: iterating over it, or indexing it, creates the PuzzleStates
+    of the nodes.
+    """
+
+    __slots__ = ('_table', '_indices')
+
+    def __init__(self, table: NodeTable):
+        self._table = table
+        self._indices = array('q')
+
+    def __len__(self):
+        return len(self._indices)
+
+    def __iter__(self):
+        table = self._table
+        for index in self._indices:
+            yield table.state(index)
+
+    def __getitem__(self, position: int):
+        return self._table.state(self._indices[position])
+
+    def append(self, index: int) -> None:
+        """ Adds a node to the list
+
+        :param index: The index of the node in the table
+        :return: None
+        """
+        self._indices.append(index)
@@ -0,0 +1,301 @@
+from puzzle_state import PuzzleState
+from functions import get_goal_state, read_state, check_or_create_directory
+import argparse
+import hashlib
+import mmap
+import os
+
+DATABASE_DIRECTORY = '../pattern_databases'
+DEFAULT_GROUP_SIZE = 4
+UNREACHED = 255
+_MAGIC = b'SPDB'
+
+# In-memory cache of the loaded databases, keyed by (size, packed goal state, group size)
+_databases = {}
+
+
+class PatternDatabase:
+    """Represents an additive pattern database for a given goal state
+
+    The tiles are split into disjoint groups. For each group, the table holds the exact cost of bringing the
+    tiles of the group from any positions to their goal positions, when the other tiles are ignored. A swap costs
+    half a move for every tile of the group it moves, so the costs of all groups can be added up without ever
+    counting a swap twice. The costs are stored doubled, one byte each, indexed by the positions of the group's
+    tiles written in base size^2.
+    """
+
+    def __init__(self, size: int, groups: tuple, tables: list, buffer=None):
+        self._size = size
+        self._groups = groups
+        self._tables = tables
+        self._buffer = buffer
+
+    @property
+    def size(self):
+        return self._size
+
+    @property
+    def groups(self):
+        return self._groups
+
+    def distance(self, state) -> float:
+        """ Looks up the pattern database distance of a given state
+
+        :param state: The PuzzleState to evaluate
+        :return: The sum of the costs of every group
+        """
+        cells = self._size * self._size
+        positions = [0] * (cells + 1)
+        for index, value in enumerate(state.tiles):
+            positions[value] = index
+
+        distance = 0
+        for group, table in zip(self._groups, self._tables):
+            table_index = 0
+            for value in group:
+                table_index = table_index * cells + positions[value]
+            distance += table[table_index]
+        return distance / 2
+
+
+def default_groups(goal_state, group_size: int = DEFAULT_GROUP_SIZE) -> tuple:
+    """ Splits the tiles of a goal state into groups of neighbouring tiles, in row-major order
+
+    :param goal_state: The goal state
+    :param group_size: The number of tiles in each group. The last group may be smaller.
+    :return: The groups, as a tuple of tuples of tile values
+    """
+    tiles = goal_state.tiles
+    return tuple(tiles[x:x + group_size] for x in range(0, len(tiles), group_size))
+
+
+def build_group_table(goal_state, group: tuple) -> bytearray:
+    """ Computes the cost of every placement of a group of tiles, by a backward search from the goal
+
+    Moves cost 1 or 2 (in doubled units) depending on how many tiles of the group they move, so the search
+    is a Dijkstra search using one bucket per cost.
+
+    :param goal_state: The goal state
+    :param group: The tile values of the group
+    :return: The table of doubled costs. Placements that cannot be reached are UNREACHED.
+    """
+    size = goal_state.size
+    cells = size * size
+    weights = [cells ** (len(group) - 1 - k) for k in range(len(group))]
+    neighbours = []
+    for index in range(cells):
+        row, col = divmod(index, size)
+        neighbours.append([row2 * size + col2
+                           for row2, col2 in ((row - 1, col), (row, col + 1), (row + 1, col), (row, col - 1))
+                           if 0 <= row2 < size and 0 <= col2 < size])
+
+    goal_indices = {value: index for index, value in enumerate(goal_state.tiles)}
+    goal_index = sum(goal_indices[value] * weight for value, weight in zip(group, weights))
+
+    table = bytearray([UNREACHED]) * (cells ** len(group))
+    table[goal_index] = 0
+    buckets = [[goal_index]]
+    cost = 0
+    while cost < len(buckets):
+        for table_index in buckets[cost]:
+            if table[table_index] != cost:
+                continue
+
+            positions = []
+            remainder = table_index
+            for weight in weights:
+                position, remainder = divmod(remainder, weight)
+                positions.append(position)
+            occupied = {position: k for k, position in enumerate(positions)}
+
+            for k, position in enumerate(positions):
+                for neighbour in neighbours[position]:
+                    other = occupied.get(neighbour)
+                    if other is None:
+                        next_index = table_index + (neighbour - position) * weights[k]
+                        next_cost = cost + 1
+                    elif position < neighbour:
+                        next_index = table_index + (neighbour - position) * (weights[k] - weights[other])
+                        next_cost = cost + 2
+                    else:
+                        continue
+                    if next_cost < table[next_index]:
+                        table[next_index] = next_cost
+                        while len(buckets) <= next_cost:
+                            buckets.append([])
+                        buckets[next_cost].append(next_index)
+        buckets[cost] = None
+        cost += 1
+    return table
+
+
+def get_database_file(goal_state, groups: tuple, directory: str = DATABASE_DIRECTORY) -> str:
+    """ Gets the path of the file holding the database of a given goal state and groups
+
+    :param goal_state: The goal state
+    :param groups: The groups of tiles
+    :param directory: The directory the databases are kept in
+    :return: The path to the file
+    """
+    key = repr((goal_state.size, goal_state.tiles, groups)).encode()
+    digest = hashlib.sha1(key).hexdigest()[:16]
+    return f'{directory}/pdb_{goal_state.size}x{goal_state.size}_{digest}.bin'
+
+
+def build_pattern_database(goal_state, group_size: int = DEFAULT_GROUP_SIZE,
+                           directory: str = DATABASE_DIRECTORY) -> str:
+    """ Builds the pattern database of a given goal state and writes it to its file
+
+    The file starts with a small header (magic, size, number of groups, then the tiles of every group),
+    followed by the tables of every group, one after the other.
+
+    :param goal_state: The goal state
+    :param group_size: The number of tiles in each group
+    :param directory: The directory the databases are kept in
+    :return: The path to the file
+    """
+    groups = default_groups(goal_state, group_size)
+    database_file = get_database_file(goal_state, groups, directory)
+    check_or_create_directory(directory)
+
+    header = bytearray(_MAGIC)
+    header += bytes([goal_state.size, len(groups)])
+    for group in groups:
+        header += bytes([len(group)]) + bytes(group)
+
+    # Write to a temporary file first, so other processes never map a half-written database
+    temporary_file = f'{database_file}.{os.getpid()}.tmp'
+    with open(temporary_file, 'wb') as file:
+        file.write(header)
+        for group in groups:
+            file.write(build_group_table(goal_state, group))
+    os.replace(temporary_file, database_file)
+    return database_file
+
+
+def load_pattern_database(database_file: str) -> PatternDatabase:
+    """ Maps a pattern database file into memory
+
+    The file is mapped read-only, so every process that loads it shares the same pages.
+
+    :param database_file: The path to the file
+    :return: The PatternDatabase
+    """
+    with open(database_file, 'rb') as file:
+        buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    if buffer[:4] != _MAGIC:
+        raise ValueError(f"{database_file} is not a pattern database file.")
+    size, group_count = buffer[4], buffer[5]
+    cells = size * size
+
+    groups = []
+    offset = 6
+    for _ in range(group_count):
+        group_length = buffer[offset]
+        groups.append(tuple(buffer[offset + 1:offset + 1 + group_length]))
+        offset += 1 + group_length
+
+    tables = []
+    for group in groups:
+        table_length = cells ** len(group)
+        tables.append(memoryview(buffer)[offset:offset + table_length])
+        offset += table_length
+    return PatternDatabase(size, tuple(groups), tables, buffer)
+
+
+def get_pattern_database(goal_state, group_size: int = DEFAULT_GROUP_SIZE,
+                         directory: str = DATABASE_DIRECTORY) -> PatternDatabase:
+    """ Gets the pattern database of a given goal state, loading or building it if needed
+
+    :param goal_state: The goal state
+    :param group_size: The number of tiles in each group
+    :param directory: The directory the databases are kept in
+    :return: The PatternDatabase
+    """
+    key = (goal_state.size, goal_state.packed, group_size, directory)
+    database = _databases.get(key)
+    if database is None:
+        database_file = get_database_file(goal_state, default_groups(goal_state, group_size), directory)
+        if not os.path.isfile(database_file):
+            build_pattern_database(goal_state, group_size, directory)
+        database = load_pattern_database(database_file)
+        _databases[key] = database
+    return database
+
+
+class PatternDatabaseHeuristic:
+    """The pattern database distance, as a heuristic function using the databases of a given group size and directory
+
+    It can be sent to worker processes in a Job like the other heuristics, and the copies compare equal to it, so
+    results can still be grouped by heuristic.
+    """
+
+    monotonic = True
+
+    def __init__(self, group_size: int = DEFAULT_GROUP_SIZE, directory: str = DATABASE_DIRECTORY):
+        self.__name__ = 'pattern_database_distance'
+        self._group_size = group_size
+        self._directory = directory
+
+    def __call__(self, state, goal_state) -> float:
+        """ Computes the additive pattern database distance between a current given state and the goal state.
+
+        The database of the goal state is built on first use, and then loaded from its file.
+
+        :param state: The current PuzzleState
+        :param goal_state: The goal state
+        :return: The pattern database distance
+        """
+        return get_pattern_database(goal_state, self._group_size, self._directory).distance(state)
+
+    def __eq__(self, other):
+        if not isinstance(other, PatternDatabaseHeuristic):
+            return NotImplemented
+        return (self._group_size, self._directory) == (other._group_size, other._directory)
+
+    def __hash__(self):
+        return hash((self._group_size, self._directory))
+
+    def __repr__(self):
+        return f'PatternDatabaseHeuristic({self._group_size!r}, {self._directory!r})'
+
+    @property
+    def group_size(self):
+        return self._group_size
+
+    @property
+    def directory(self):
+        return self._directory
+
+    def build(self, goal_state) -> PatternDatabase:
+        """ Loads the database of a goal state, building it first if needed
+
+        Meant to be called before starting worker processes, so they all load the same file instead of building it.
+
+        :param goal_state: The goal state
+        :return: The PatternDatabase
+        """
+        return get_pattern_database(goal_state, self._group_size, self._directory)
+
+
+# The heuristic with the default group size and directory
+pattern_database_distance = PatternDatabaseHeuristic()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Builds the pattern database of the goal state.")
+    parser.add_argument('--group-size', type=int, default=DEFAULT_GROUP_SIZE,
+                        help="the number of tiles in each group")
+    parser.add_argument('--directory', default=DATABASE_DIRECTORY,
+                        help="the directory to write the database to")
+    arguments = parser.parse_args()
+
+    goal_state = PuzzleState(read_state(get_goal_state()))
+    heuristic = PatternDatabaseHeuristic(arguments.group_size, arguments.directory)
+    heuristic.build(goal_state)
+    print(get_database_file(goal_state, default_groups(goal_state, arguments.group_size), arguments.directory))
+
+
+if __name__ == '__main__':
+    main()
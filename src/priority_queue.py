@@ -0,0 +1,130 @@
+import heapq
+import itertools
+
+# The priorities are stored as multiples of 1 / KEY_SCALE, so the half-integer Manhattan distance fits in a bucket
+KEY_SCALE = 2
+
+
+class BucketQueue:
+    """An open list for best-first searches, ordered by (f, h) priorities
+
+    While every priority is a pair of small non-negative multiples of 1 / KEY_SCALE, the items are kept in buckets:
+    one list of stacks per f value, with one stack per h value, so pushing and popping never compare priorities.
+    The lowest non-empty f bucket, and the lowest non-empty h stack of every f bucket, are tracked with pointers
+    that only move up while popping, so a pop is O(1) amortised for the (mostly) increasing f values of A*. Items
+    with the same priority are popped last in, first out, which favours the most recently generated states.
+
+    The first priority that does not fit (such as the f value of a weighted A* with a fractional weight) moves
+    every item to a heap, which is then used for the rest of the search, with the same order.
+    """
+
+    __slots__ = ('_buckets', '_counts', '_lowest_h', '_lowest_f', '_length', '_heap', '_tie_breaker')
+
+    def __init__(self):
+        self._buckets = []
+        self._counts = []
+        self._lowest_h = []
+        self._lowest_f = 0
+        self._length = 0
+        self._heap = None
+        self._tie_breaker = itertools.count()
+
+    def __len__(self):
+        return self._length
+
+    def __bool__(self):
+        return self._length > 0
+
+    def push(self, priority: tuple, item) -> None:
+        """ Adds an item to the queue
+
+        :param priority: The priority of the item, as an (f, h) pair, lowest first
+        :param item: The item
+        :return: None
+        """
+        self._length += 1
+        if self._heap is None:
+            f_scaled = priority[0] * KEY_SCALE
+            h_scaled = priority[1] * KEY_SCALE
+            f_key = int(f_scaled)
+            h_key = int(h_scaled)
+            if f_key == f_scaled and h_key == h_scaled and h_key >= 0:
+                buckets = self._buckets
+                if f_key >= len(buckets):
+                    added = f_key + 1 - len(buckets)
+                    buckets.extend([] for _ in range(added))
+                    self._counts.extend([0] * added)
+                    self._lowest_h.extend([0] * added)
+                stacks = buckets[f_key]
+                if h_key >= len(stacks):
+                    stacks.extend([] for _ in range(h_key + 1 - len(stacks)))
+                stacks[h_key].append(item)
+                self._counts[f_key] += 1
+                lowest_h = self._lowest_h
+                if h_key < lowest_h[f_key]:
+                    lowest_h[f_key] = h_key
+                if f_key < self._lowest_f:
+                    self._lowest_f = f_key
+                return
+            self._to_heap()
+        heapq.heappush(self._heap, (priority, -next(self._tie_breaker), item))
+
+    def pop(self):
+        """ Removes the item with the lowest priority from the queue
+
+        :return: The item
+        """
+        if self._length == 0:
+            raise IndexError("pop from an empty BucketQueue")
+        self._length -= 1
+        if self._heap is not None:
+            return heapq.heappop(self._heap)[2]
+        f_key = self._find_lowest()
+        stacks = self._buckets[f_key]
+        self._counts[f_key] -= 1
+        return stacks[self._lowest_h[f_key]].pop()
+
+    def peek(self):
+        """ Gets the item with the lowest priority, without removing it
+
+        :return: The item
+        """
+        if self._length == 0:
+            raise IndexError("peek at an empty BucketQueue")
+        if self._heap is not None:
+            return self._heap[0][2]
+        f_key = self._find_lowest()
+        return self._buckets[f_key][self._lowest_h[f_key]][-1]
+
+    def _find_lowest(self) -> int:
+        """ Moves the pointers up to the lowest non-empty f bucket and its lowest non-empty h stack
+
+        :return: The key of the lowest non-empty f bucket
+        """
+        counts = self._counts
+        f_key = self._lowest_f
+        while not counts[f_key]:
+            f_key += 1
+        self._lowest_f = f_key
+
+        stacks = self._buckets[f_key]
+        h_key = self._lowest_h[f_key]
+        while not stacks[h_key]:
+            h_key += 1
+        self._lowest_h[f_key] = h_key
+        return f_key
+
+    def _to_heap(self) -> None:
+        """ Moves every item from the buckets to a heap, keeping their order
+
+        :return: None
+        """
+        heap = []
+        tie_breaker = self._tie_breaker
+        for f_key, stacks in enumerate(self._buckets):
+            for h_key, stack in enumerate(stacks):
+                for item in stack:
+                    heap.append(((f_key / KEY_SCALE, h_key / KEY_SCALE), -next(tie_breaker), item))
+        heapq.heapify(heap)
+        self._heap = heap
+        self._buckets = self._counts = self._lowest_h = None
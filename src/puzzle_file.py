@@ -0,0 +1,167 @@
+from puzzle_state import _pack, _unpack, _tile_bits
+from functions import get_all_puzzles, read_state
+import argparse
+import mmap
+import os
+
+PUZZLE_FILE = '../input/input_puzzles.txt'
+_MAGIC = b'SPZB'
+_HEADER_LENGTH = 5
+
+
+def _record_bytes(size: int) -> int:
+    """ Gets the number of bytes of a puzzle in a binary puzzle file
+
+    :param size: The size of the puzzles
+    :return: The number of bytes
+    """
+    return (size * size * _tile_bits(size) + 7) // 8
+
+
+def read_puzzles(puzzle_file: str = PUZZLE_FILE):
+    """ Lazily reads the puzzles of a text puzzle file, one per line
+
+    The size of the first puzzle is the size every other puzzle of the file must have.
+
+    :param puzzle_file: The path to the file
+    :return: A generator of the puzzles, as tuples of tuples
+    """
+    size = None
+    for line_number, line in enumerate(get_all_puzzles(puzzle_file), 1):
+        try:
+            puzzle = read_state(line, size)
+        except ValueError as error:
+            raise ValueError(f"{puzzle_file}, line {line_number}: {error}") from None
+        size = len(puzzle)
+        yield puzzle
+
+
+def write_binary_puzzles(puzzle_file: str, puzzles) -> int:
+    """ Writes puzzles to a binary puzzle file
+
+    The file starts with a small header (magic and size), followed by every puzzle, packed like a PuzzleState into a
+    fixed number of bytes. The puzzles are written as they come, so they can come from a generator.
+
+    :param puzzle_file: The path to the file
+    :param puzzles: The puzzles, as tuples of tuples (or lists of lists), all of the same size, with tiles from 1 to
+                    size * size
+    :return: The number of puzzles written
+    """
+    count = 0
+    size = None
+    # Write to a temporary file first, so a failed conversion never leaves a half-written puzzle file behind
+    temporary_file = f'{puzzle_file}.{os.getpid()}.tmp'
+    try:
+        with open(temporary_file, 'wb') as file:
+            for puzzle in puzzles:
+                if size is None:
+                    size = len(puzzle)
+                    record_bytes = _record_bytes(size)
+                    all_tiles = set(range(1, size * size + 1))
+                    file.write(_MAGIC + bytes([size]))
+                tiles = [value for row in puzzle for value in row]
+                # Only a permutation of 1 to size * size can be packed and unpacked again
+                if len(puzzle) != size or len(tiles) != size * size or set(tiles) != all_tiles:
+                    raise ValueError(f"Puzzle {count + 1} is not a permutation of the tiles of a {size}-by-{size} "
+                                     f"puzzle.")
+                file.write(_pack(tiles, size).to_bytes(record_bytes, 'little'))
+                count += 1
+        if size is None:
+            raise ValueError("There are no puzzles to write.")
+        os.replace(temporary_file, puzzle_file)
+    finally:
+        if os.path.exists(temporary_file):
+            os.remove(temporary_file)
+    return count
+
+
+class BinaryPuzzles:
+    """The puzzles of a binary puzzle file, as written by write_binary_puzzles()
+
+    The file is mapped read-only, so the puzzles are only read when they are used, and can be indexed directly.
+    """
+
+    def __init__(self, puzzle_file: str):
+        with open(puzzle_file, 'rb') as file:
+            self._buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if self._buffer[:4] != _MAGIC:
+            raise ValueError(f"{puzzle_file} is not a binary puzzle file.")
+        self._size = self._buffer[4]
+        self._record_bytes = _record_bytes(self._size)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return (len(self._buffer) - _HEADER_LENGTH) // self._record_bytes
+
+    def __getitem__(self, index: int) -> tuple:
+        index = range(len(self))[index]
+        offset = _HEADER_LENGTH + index * self._record_bytes
+        packed = int.from_bytes(self._buffer[offset:offset + self._record_bytes], 'little')
+        tiles = _unpack(packed, self._size)
+        size = self._size
+        return tuple(tiles[row:row + size] for row in range(0, size * size, size))
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    @property
+    def size(self):
+        return self._size
+
+    def close(self) -> None:
+        """ Unmaps the file
+
+        :return: None
+        """
+        self._buffer.close()
+
+
+def is_binary_puzzle_file(puzzle_file: str) -> bool:
+    """ Checks whether a puzzle file is a binary puzzle file, from its first bytes
+
+    :param puzzle_file: The path to the file
+    :return: True if it is a binary puzzle file, False if it is a text one
+    """
+    with open(puzzle_file, 'rb') as file:
+        return file.read(len(_MAGIC)) == _MAGIC
+
+
+class PuzzleFile:
+    """The puzzles of a text or binary puzzle file, read lazily every time they are iterated over
+
+    Unlike a generator, a PuzzleFile can be iterated over as many times as needed, such as once per algorithm and
+    heuristic, without ever holding all of its puzzles in memory.
+    """
+
+    def __init__(self, puzzle_file: str = PUZZLE_FILE):
+        self._puzzle_file = puzzle_file
+        self._binary = is_binary_puzzle_file(puzzle_file)
+
+    def __iter__(self):
+        if not self._binary:
+            yield from read_puzzles(self._puzzle_file)
+            return
+        with BinaryPuzzles(self._puzzle_file) as puzzles:
+            yield from puzzles
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Converts a text puzzle file to a binary puzzle file.")
+    parser.add_argument('input', nargs='?', default=PUZZLE_FILE, help="the text puzzle file")
+    parser.add_argument('output', nargs='?', help="the binary puzzle file, by default the input with a .bin suffix")
+    arguments = parser.parse_args()
+
+    output = arguments.output or os.path.splitext(arguments.input)[0] + '.bin'
+    count = write_binary_puzzles(output, read_puzzles(arguments.input))
+    print(f"{count} puzzles written to {output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,34 +1,182 @@
-from copy import deepcopy
+from search_budget import SearchBudget, SearchResult
+from search_stats import ExpansionCounter
+from priority_queue import BucketQueue
+from node_table import NodeTable, NodeList
+from functools import lru_cache
+import itertools
 import time
 import heapq
 
 
+@lru_cache(maxsize=None)
+def _tile_bits(size: int) -> int:
+    """ Gets the number of bits used to store a single tile of a size-by-size puzzle
+
+    Tiles are stored as (value - 1), so a 4x4 puzzle fits in 4 bits per tile.
+
+    :param size: The size of the puzzle
+    :return: The number of bits per tile
+    """
+    return max(1, (size * size - 1).bit_length())
+
+
+def _pack(tiles, size: int) -> int:
+    """ Packs the given tiles, in row-major order, into a single integer
+
+    :param tiles: The tile values, in row-major order
+    :param size: The size of the puzzle
+    :return: The packed state
+    """
+    bits = _tile_bits(size)
+    packed = 0
+    for index, value in enumerate(tiles):
+        packed |= (value - 1) << (index * bits)
+    return packed
+
+
+def _unpack(packed: int, size: int) -> tuple:
+    """ Unpacks a packed state into its tile values, in row-major order
+
+    :param packed: The packed state
+    :param size: The size of the puzzle
+    :return: The tile values as a tuple
+    """
+    bits = _tile_bits(size)
+    mask = (1 << bits) - 1
+    return tuple(((packed >> (index * bits)) & mask) + 1 for index in range(size * size))
+
+
+def _tile_at(packed: int, size: int, index: int) -> int:
+    """ Gets the value of the tile at the given row-major index of a packed state
+
+    :param packed: The packed state
+    :param size: The size of the puzzle
+    :param index: The row-major index of the tile
+    :return: The tile value
+    """
+    bits = _tile_bits(size)
+    return ((packed >> (index * bits)) & ((1 << bits) - 1)) + 1
+
+
+@lru_cache(maxsize=None)
+def _swap_moves(size: int) -> tuple:
+    """ Gets every swap of 2 adjacent tiles of a size-by-size puzzle, as pairs of row-major indices.
+
+    There are 2 * size * (size - 1) of them, each listed once with the smaller index first.
+
+    :param size: The size of the puzzle
+    :return: The swaps as a tuple of tuples
+    """
+    moves = []
+    for index in range(size * size):
+        row, col = divmod(index, size)
+        if col + 1 < size:
+            moves.append((index, index + 1))
+        if row + 1 < size:
+            moves.append((index, index + size))
+    return tuple(moves)
+
+
+@lru_cache(maxsize=64)
+def _tile_indices(packed: int, size: int) -> tuple:
+    """ Gets the row-major index of every tile of a packed state.
+
+    Cached, since it is mostly used on goal states, which are looked up over and over
+
+    :param packed: The packed state
+    :param size: The size of the puzzle
+    :return: A tuple where the item at position value is the index of that value
+    """
+    indices = [0] * (size * size + 1)
+    for index, value in enumerate(_unpack(packed, size)):
+        indices[value] = index
+    return tuple(indices)
+
+
+class _SMANode:
+    """A node of the SMA* search tree
+
+    f is the backed-up f value of the node, which can be higher than the f value of its state. children holds the
+    successors currently in memory, and forgotten the backed-up f values of the successors that were evicted,
+    both keyed by the index of their move in the swap table.
+    """
+
+    __slots__ = ('state', 'f', 'parent', 'move', 'children', 'forgotten', 'expanded', 'in_open', 'version')
+
+    def __init__(self, state, f, parent=None, move=None):
+        self.state = state
+        self.f = f
+        self.parent = parent
+        self.move = move
+        self.children = {}
+        self.forgotten = {}
+        self.expanded = False
+        self.in_open = False
+        self.version = 0
+
+
 class PuzzleState:
-    """Represents a puzzle state"""
+    """Represents a puzzle state
+
+    The board is packed into a single integer, with (value - 1) of each tile stored in
+    _tile_bits(size) bits, in row-major order. state, positions and get_position() are views
+    built from the packed integer.
+    """
+
+    __slots__ = ('_packed', '_size', '_parent', '_level', '_f_value', '_swapped')
 
     def __init__(self, state, level=0, parent=None):
         self.state = state
-        self._size = len(state)
         self._parent = parent
         self._level = level
         self._f_value = 0
-        self._set_positions()
+        self._swapped = None
+
+    @classmethod
+    def _from_packed(cls, packed: int, size: int, level=0, parent=None, swapped=None):
+        """ Creates a PuzzleState directly from an already packed (and so already validated) state
+
+        :param packed: The packed state
+        :param size: The size of the puzzle
+        :param level: The level of the new PuzzleState
+        :param parent: The parent of the new PuzzleState
+        :param swapped: The row-major indices of the 2 tiles swapped to get here from the parent, if any
+        :return: The new PuzzleState
+        """
+        new_state = cls.__new__(cls)
+        new_state._packed = packed
+        new_state._size = size
+        new_state._parent = parent
+        new_state._level = level
+        new_state._f_value = 0
+        new_state._swapped = swapped
+        return new_state
 
     def __str__(self):
-        return str(self._state)
+        return str(self.state)
 
     def __eq__(self, other_state):
-        return self.state == other_state.state
+        return self._packed == other_state._packed and self._size == other_state._size
 
     def __lt__(self, other_state):
         return self._f_value < other_state._f_value
 
     def __hash__(self):
-        return hash(('state', list(self.state)))
+        return hash(self._packed)
 
     @property
     def state(self):
-        return self._state
+        tiles = self.tiles
+        size = self._size
+        return [list(tiles[row:row + size]) for row in range(0, size * size, size)]
+
+    @property
+    def tiles(self) -> tuple:
+        return _unpack(self._packed, self._size)
+
+    @property
+    def packed(self) -> int:
+        return self._packed
 
     @property
     def size(self):
@@ -40,19 +188,26 @@ class PuzzleState:
 
     @property
     def positions(self):
-        return self._positions
+        size = self._size
+        return {value: divmod(index, size) for index, value in enumerate(self.tiles)}
 
     @state.setter
     def state(self, state: tuple) -> None:
-        """ Directly manipulates the state, because _state is a private variable
+        """ Packs the given state into _packed, because the board is not stored as a list
 
-        :param state: The state
-        :return: The state as a list
+        :param state: The state, as a tuple of tuples or a list of lists
+        :return: None
         """
-        state_as_list = []
+        size = len(state)
+        tiles = []
         for row in state:
-            state_as_list.append(list(row))
-        self._state = state_as_list
+            if len(row) != size:
+                raise ValueError("Puzzle is not square. Must be a n-by-n puzzle.")
+            tiles.extend(row)
+        if sorted(tiles) != list(range(1, size * size + 1)):
+            raise ValueError("Puzzle must contain each value from 1 to n^2 exactly once.")
+        self._size = size
+        self._packed = _pack(tiles, size)
 
     def get_f_value(self) -> int:
         """ Gets the f value
@@ -61,15 +216,35 @@ class PuzzleState:
         """
         return self._f_value
 
-    def set_f_value(self, heuristic_func, goal_state: tuple) -> None:
+    def set_f_value(self, heuristic_func, goal_state: tuple, weight=1) -> None:
         """ Sets the f value based on the given given goal state and the given heuristic function
 
         :param heuristic_func: The heuristic function to call
         :param goal_state: The goal state
+        :param weight: The weight of the h value in the f value, for weighted A*. Default is 1.
         :return: None
         """
         h_value = heuristic_func(self, goal_state)
-        self._f_value = (h_value + self.level, h_value)
+        self._f_value = (h_value * weight + self.level, h_value)
+
+    def update_f_value(self, heuristic_func, goal_state, weight=1) -> None:
+        """ Sets the f value from the parent's h value, using the incremental form of the heuristic if it has one.
+
+        Assumes the parent's f value was set with the same heuristic function and goal state.
+        Falls back to set_f_value() when there is no parent or no incremental form.
+
+        :param heuristic_func: The heuristic function to call
+        :param goal_state: The goal state
+        :param weight: The weight of the h value in the f value, for weighted A*. Default is 1.
+        :return: None
+        """
+        incremental = getattr(heuristic_func, 'incremental', None)
+        parent = self._parent
+        if incremental is None or self._swapped is None or not parent._f_value:
+            self.set_f_value(heuristic_func, goal_state, weight)
+            return
+        h_value = incremental(parent, parent._f_value[1], self._swapped, goal_state)
+        self._f_value = (h_value * weight + self.level, h_value)
 
     def get_position(self, value: int) -> tuple:
         """ Gets the position of the given value
@@ -77,7 +252,16 @@ class PuzzleState:
         :param value: The value to find the position of
         :return: The position of the value
         """
-        return self._positions.get(value)
+        size = self._size
+        if not 1 <= value <= size * size:
+            return None
+        bits = _tile_bits(size)
+        mask = (1 << bits) - 1
+        packed = self._packed
+        for index in range(size * size):
+            if (packed >> (index * bits)) & mask == value - 1:
+                return divmod(index, size)
+        return None
 
     def get_value(self, position: tuple):
         """ Gets the value of a given position
@@ -86,7 +270,9 @@ class PuzzleState:
         :return: The value of the state
         """
         if self.is_legal_position(position):
-            return self.state[position[0]][position[1]]
+            bits = _tile_bits(self._size)
+            index = position[0] * self._size + position[1]
+            return ((self._packed >> (index * bits)) & ((1 << bits) - 1)) + 1
         return None
 
     def is_legal_position(self, position: tuple) -> bool:
@@ -117,6 +303,25 @@ class PuzzleState:
 
         return next_positions
 
+    def successors(self):
+        """ Lazily generates every state that can be derived directly from the current state of the puzzle.
+
+        Each adjacent pair of tiles is swapped exactly once, using the cached swap table of the board size.
+
+        :return: A generator of the next states
+        """
+        size = self._size
+        bits = _tile_bits(size)
+        mask = (1 << bits) - 1
+        packed = self._packed
+        level = self._level + 1
+        for move in _swap_moves(size):
+            first_shift = move[0] * bits
+            second_shift = move[1] * bits
+            diff = ((packed >> first_shift) ^ (packed >> second_shift)) & mask
+            yield PuzzleState._from_packed(packed ^ ((diff << first_shift) | (diff << second_shift)),
+                                           size, level, self, move)
+
     def _switch_positions(self, start_position: tuple, end_position: tuple):
         """ Switches 2 tiles
 
@@ -124,27 +329,26 @@ class PuzzleState:
         :param end_position: The second tile position
         :return: A new PuzzleState with the 2 tiles switched
         """
-        start_value = self.get_value(start_position)
-        end_value = self.get_value(end_position)
-
-        new_state = deepcopy(self._state)
-        new_state[start_position[0]][start_position[1]] = end_value
-        new_state[end_position[0]][end_position[1]] = start_value
+        size = self._size
+        return self._swap(start_position[0] * size + start_position[1],
+                          end_position[0] * size + end_position[1])
 
-        return PuzzleState(new_state, self._level + 1, self)
+    def _swap(self, first_index: int, second_index: int):
+        """ Switches the tiles at 2 row-major indices, using bit operations on the packed state
 
-    def _set_positions(self) -> None:
-        """ Sets the positions of each tile based on the current state
-
-        :return: None
+        :param first_index: The index of the first tile
+        :param second_index: The index of the second tile
+        :return: A new PuzzleState with the 2 tiles switched
         """
-        positions = {}
-        for row_index, row in enumerate(self._state):
-            if len(row) != self.size:
-                raise AssertionError("Puzzle is not square. Must be a n-by-n puzzle.")
-            for val_index, val in enumerate(row):
-                positions[val] = (row_index, val_index)
-        self._positions = positions
+        bits = _tile_bits(self._size)
+        packed = self._packed
+        first_shift = first_index * bits
+        second_shift = second_index * bits
+        mask = (1 << bits) - 1
+        diff = ((packed >> first_shift) ^ (packed >> second_shift)) & mask
+        packed ^= (diff << first_shift) | (diff << second_shift)
+
+        return PuzzleState._from_packed(packed, self._size, self._level + 1, self, (first_index, second_index))
 
     @staticmethod
     def hamming_distance(state, goal_state) -> int:
@@ -156,13 +360,9 @@ class PuzzleState:
         """
         PuzzleState.hamming_distance.monotonic = False
         distance = 0
-        state_tuple = state.state
-        goal_state_tuple = goal_state.state
-
-        for row_index, row in enumerate(state_tuple):
-            for val_index, val in enumerate(row):
-                if state_tuple[row_index][val_index] != goal_state_tuple[row_index][val_index]:
-                    distance += 1
+        for value, goal_value in zip(state.tiles, goal_state.tiles):
+            if value != goal_value:
+                distance += 1
         return distance
 
     @staticmethod
@@ -178,195 +378,1363 @@ class PuzzleState:
         """
         PuzzleState.manhattan_distance.monotonic = True
         distance = 0
-        for value, position in state.positions.items():
-            row_distance = abs(position[0] - goal_state.get_position(value)[0])
-            col_distance = abs(position[1] - goal_state.get_position(value)[1])
-            distance += row_distance + col_distance
+        size = state.size
+        goal_indices = _tile_indices(goal_state.packed, goal_state.size)
+        for index, value in enumerate(state.tiles):
+            row, col = divmod(index, size)
+            goal_row, goal_col = divmod(goal_indices[value], size)
+            distance += abs(row - goal_row) + abs(col - goal_col)
         return distance / 2
 
     @staticmethod
     def sum_permutation(state, goal_state) -> int:
         """ Computes the sum permutation between a current given state and the goal state.
 
+        This is the number of pairs of tiles that are in the opposite order in the state compared
+        to the goal. The state is mapped to goal-rank order using the goal's cached index table, and
+        the inversions are counted with a Fenwick tree, so this is O(n log n) in the number of tiles.
+
         :param state: The current PuzzleState
         :param goal_state: The goal state
         :return: The sum permutation
         """
         PuzzleState.sum_permutation.monotonic = False
+        goal_ranks = _tile_indices(goal_state.packed, goal_state.size)
+        tile_count = state.size ** 2
+        tree = [0] * (tile_count + 1)
         sum = 0
 
-        for row in goal_state.state:
-            for current in row:
-                left = []
-                is_left = True
-                for row in goal_state.state:
-                    for value in row:
-                        if value == current:
-                            is_left = False
-                        if is_left and value != current:
-                            left.append(value)
-
-                is_right = False
-                for row in state.state:
-                    for value in row:
-                        if is_right and value in left:
-                            sum += 1
-                        if value == current:
-                            is_right = True
+        for seen, value in enumerate(state.tiles):
+            rank = goal_ranks[value] + 1
+
+            # Count the tiles already seen that come before this one in the goal
+            smaller = 0
+            index = rank
+            while index > 0:
+                smaller += tree[index]
+                index -= index & -index
+            sum += seen - smaller
+
+            index = rank
+            while index <= tile_count:
+                tree[index] += 1
+                index += index & -index
         return sum
 
     @staticmethod
-    def a_star(start_state, goal_state, heuristic_func, time_limit=60) -> tuple:
+    def a_star(start_state, goal_state, heuristic_func, time_limit=60, trace=None, stats=None,
+               budget=None, cache=None, state_key=None, batch_heuristic=None, weight=1) -> SearchResult:
         """ Performs the A* algorithm.
 
-        :param time_limit: The time limit
+        The open list is a BucketQueue (see priority_queue.py) with lazy deletion: a better path to
+        a state is pushed as a new entry, and entries that are worse than the best known g value of
+        their state are skipped when popped. The best g value of every open or closed state is kept
+        in a dict, and the closed states in a set, so every lookup is O(1).
+
+        The nodes themselves are kept in a NodeTable (see node_table.py), and the open and closed lists
+        only hold their indices, so a successor that is not better than what is known is freed at once,
+        and the solution path is rebuilt by replaying its swaps from the start state.
+
+        With a weight above 1, this is weighted A*: states are ordered by g + weight * h, which finds a solution
+        much sooner, at most weight times as long as the optimal one when the heuristic is admissible.
+
+        The search stops once it goes over its budget, which is only checked every few expanded nodes.
+
+        :param time_limit: The time limit, used when no budget is given
         :param start_state: The Starting PuzzleState
         :param goal_state: The goal state
         :param heuristic_func: The heuristic function to use for the algorithm
-        :return: The open list, the closed list, and the elapsed time of the algorithm, all as a tuple.
+        :param trace: A SearchTrace to stream the expanded states to, instead of keeping them in a list. Default is None.
+        :param stats: A SearchStats to fill in with counters, phase times and callbacks. Default is None.
+        :param budget: A SearchBudget limiting the time, expanded nodes and live nodes. Default is None.
+        :param cache: A SolutionCache to look the solution up in before searching, and to store it in after.
+                      A solution found in the cache comes with an empty closed list. Default is None.
+        :param state_key: A function giving the key of a state for duplicate detection, such as
+                          symmetry.symmetry_key(). States with the same key must be as far from the goal.
+                          Default is None, for the packed state.
+        :param batch_heuristic: A function scoring a whole list of states at once, such as
+                                vectorized.batch_heuristic(). The new successors of a state are then scored in a
+                                single call, which must give the same values as heuristic_func. Default is None.
+        :param weight: The weight of the heuristic, at least 1. Default is 1, for plain A*.
+        :return: The solution path, the closed list (or the trace), and the elapsed time of the algorithm, as a
+                 SearchResult. If a budget was exceeded, the paths are None and the result says which budget it was.
         """
+        if budget is None:
+            budget = SearchBudget(time_limit)
+        solver = 'a_star/' + heuristic_func.__name__
+        if weight != 1:
+            solver += f'/weight_{weight}'
+        timing = stats is not None and stats.timing
+        start_state.set_f_value(heuristic_func, goal_state, weight)
+        reopen_closed = not getattr(heuristic_func, 'monotonic', True)
+        table = NodeTable(start_state, _swap_moves(start_state.size), weight)
+        open_list = BucketQueue()
+        open_list.push(start_state.get_f_value(), table.add(start_state))
+        best_g = {start_state.packed if state_key is None else state_key(start_state): start_state.level}
+        closed_set = set()
+        closed_list = NodeList(table) if trace is None else trace
+
+        start_time = time.perf_counter()
+        if cache is not None:
+            path_list = cache.lookup(solver, start_state, goal_state)
+            if path_list is not None:
+                for state in path_list:
+                    state.set_f_value(heuristic_func, goal_state, weight)
+                if stats is not None and stats.on_solution is not None:
+                    stats.on_solution(path_list)
+                return SearchResult(path_list, closed_list, time.perf_counter() - start_time)
+        next_check = 0
 
-        current_state = start_state
-        current_state.set_f_value(heuristic_func, goal_state)
-        open_list = [start_state]
-        heapq.heapify(open_list)
-        closed_list = []
-        highest_value = goal_state.size**2 - 1
-
-        start_time = time.time()
-        elapsed = 0.0
-
-        def compare_and_replace_state_in_heap(state, state_heap) -> None:
-            """ Replaces the current PuzzleState with one that already exists in
-            the given list, if this current PuzzleState has a lower f value
+        while open_list:
+            if len(closed_list) >= next_check:
+                elapsed = time.perf_counter() - start_time
+                exceeded = budget.exceeded(elapsed, len(closed_list), len(open_list) + len(closed_list))
+                if exceeded is not None:
+                    return SearchResult(None, None, elapsed, exceeded)
+                next_check = budget.next_check(len(closed_list))
+
+            if timing:
+                mark = time.perf_counter()
+            current_index = open_list.pop()
+            if stats is not None:
+                stats.heap_pops += 1
+                if timing:
+                    stats.lap('queue', mark)
+            if state_key is None:
+                current_state = None
+                current_key = table.packed(current_index)
+            else:
+                current_state = table.state(current_index)
+                current_key = state_key(current_state)
+            if table.level(current_index) > best_g[current_key]:
+                # A better path to this state was found after this entry was pushed
+                continue
+
+            if current_state is None:
+                current_state = table.state(current_index)
+            closed_set.add(current_key)
+            closed_list.append(current_index if trace is None else current_state)
+            if stats is not None:
+                stats.expanded += 1
+                stats.update_peaks(len(open_list), len(closed_set))
+                if stats.on_expand is not None:
+                    stats.on_expand(current_state)
+            if current_state == goal_state:
+                break
+
+            children = [] if batch_heuristic is not None else None
+            if timing:
+                mark = time.perf_counter()
+            for state in current_state.successors():
+                if stats is not None:
+                    stats.generated += 1
+                    if stats.on_generate is not None:
+                        stats.on_generate(state)
+                    if timing:
+                        mark = stats.lap('successors', mark)
+
+                key = state.packed if state_key is None else state_key(state)
+                old_g = best_g.get(key)
+                is_better = old_g is None or state.level < old_g
+                if is_better and key in closed_set:
+                    if reopen_closed:
+                        closed_set.discard(key)
+                        if stats is not None:
+                            stats.reopened += 1
+                    else:
+                        is_better = False
+                if timing:
+                    mark = stats.lap('duplicates', mark)
+                if not is_better:
+                    continue
+
+                best_g[key] = state.level
+                if children is not None:
+                    children.append(state)
+                    continue
+                state.update_f_value(heuristic_func, goal_state, weight)
+                if timing:
+                    mark = stats.lap('heuristic', mark)
+                open_list.push(state.get_f_value(), table.add(state, current_index))
+                if stats is not None:
+                    stats.heap_pushes += 1
+                    if timing:
+                        mark = stats.lap('queue', mark)
+
+            if children:
+                for state, h in zip(children, batch_heuristic(children)):
+                    state._f_value = (h * weight + state.level, h)
+                if timing:
+                    mark = stats.lap('heuristic', mark)
+                for state in children:
+                    open_list.push(state._f_value, table.add(state, current_index))
+                if stats is not None:
+                    stats.heap_pushes += len(children)
+                    if timing:
+                        stats.lap('queue', mark)
+        else:
+            return SearchResult([], closed_list, time.perf_counter() - start_time)
+
+        path_list = table.path(current_index)
+        if stats is not None and stats.on_solution is not None:
+            stats.on_solution(path_list)
+        if cache is not None:
+            cache.store(solver, path_list, goal_state)
+
+        return SearchResult(path_list, closed_list, time.perf_counter() - start_time)
 
-            :param state_heap: The heap of states to check against
-            :param state: The given PuzzleState
+    @staticmethod
+    def sma_star(start_state, goal_state, heuristic_func, max_nodes: int, time_limit=60, trace=None, stats=None,
+                 budget=None) -> SearchResult:
+        """ Performs the Simplified Memory-bounded A* (SMA*) algorithm.
+
+        The search tree never holds more than max_nodes nodes. Before a node is expanded, the leaves with the
+        highest f value (the shallowest ones on ties) are evicted until its successors fit, and their f values are
+        remembered by their parents, which go back into the open list so the evicted successors can be generated
+        again later. Successors that still do not fit are remembered the same way by the expanded node, without
+        ever being added to the tree. The f value of every expanded node is backed up from its successors, so the
+        parents always know how good their best forgotten subtree is. The best node (lowest f value, deepest on
+        ties) is expanded first, generating all of its successors that are not in memory, except the one that
+        undoes its last swap.
+
+        Like A*, the solution is optimal with an admissible heuristic, as long as it is at most max_nodes - 1
+        moves long. Nodes deeper than that cannot be reached within the memory, and get an infinite f value.
+
+        :param time_limit: The time limit, used when no budget is given
+        :param start_state: The Starting PuzzleState
+        :param goal_state: The goal state
+        :param heuristic_func: The heuristic function to use for the algorithm
+        :param max_nodes: The maximum number of nodes in memory
+        :param trace: A SearchTrace to stream the expanded states to. Default is None, to only count them, since
+                      keeping every expanded state would defeat the memory bound.
+        :param stats: A SearchStats to fill in with counters and callbacks. Default is None.
+        :param budget: A SearchBudget limiting the time and expanded nodes. Default is None.
+        :return: The solution path, the counter of expanded states (or the trace), and the elapsed time of the
+                 algorithm, as a SearchResult. If a budget was exceeded, the paths are None and the result says
+                 which budget it was.
+        """
+        if budget is None:
+            budget = SearchBudget(time_limit)
+        moves = _swap_moves(start_state.size)
+        infinity = float('inf')
+        start_state.set_f_value(heuristic_func, goal_state)
+        root = _SMANode(start_state, start_state.get_f_value()[0])
+        node_count = 1
+        tie_breaker = itertools.count()
+        # Both heaps use lazy deletion: an entry is only valid if its version is the current version of its node
+        best_heap = []
+        worst_heap = []
+        closed_list = ExpansionCounter() if trace is None else trace
+
+        def push(node) -> None:
+            """ Puts a node (back) in the open list, with its current f value
+
+            :param node: The _SMANode
             :return: None
             """
-            if has_smaller_f_in_list(state, state_heap):
-                old_state_index = state_heap.index(state)
-                state_heap[old_state_index] = state
-                heapq.heapify(state_heap)
+            node.version += 1
+            node.in_open = True
+            level = node.state.level
+            heapq.heappush(best_heap, (node.f, -level, next(tie_breaker), node.version, node))
+            if not node.children:
+                heapq.heappush(worst_heap, (-node.f, level, next(tie_breaker), node.version, node))
+            if stats is not None:
+                stats.heap_pushes += 1
+
+        def evict_worst(expanding) -> bool:
+            """ Forgets the leaf with the highest f value, which its parent remembers
+
+            :param expanding: The node being expanded, which is never evicted, even if it is pushed back into the
+                              open list by the eviction of its own successors
+            :return: Whether a leaf could be evicted
+            """
+            nonlocal node_count
+            kept = None
+            while worst_heap:
+                entry = heapq.heappop(worst_heap)
+                worst = entry[4]
+                if (not worst.in_open or entry[3] != worst.version or worst.children
+                        or worst.parent is None):
+                    continue
+                if worst is expanding:
+                    kept = entry
+                    continue
+                parent = worst.parent
+                del parent.children[worst.move]
+                parent.forgotten[worst.move] = worst.f
+                worst.in_open = False
+                node_count -= 1
+                push(parent)
+                break
+            else:
+                worst = None
+            if kept is not None:
+                heapq.heappush(worst_heap, kept)
+            return worst is not None
+
+        push(root)
+        start_time = time.perf_counter()
+        next_check = 0
+        while best_heap:
+            if len(closed_list) >= next_check:
+                elapsed = time.perf_counter() - start_time
+                exceeded = budget.exceeded(elapsed, len(closed_list), node_count)
+                if exceeded is not None:
+                    return SearchResult(None, None, elapsed, exceeded)
+                next_check = budget.next_check(len(closed_list))
+
+            _, _, _, version, node = heapq.heappop(best_heap)
+            if stats is not None:
+                stats.heap_pops += 1
+            if not node.in_open or version != node.version:
+                continue
+            if node.f == infinity:
+                # Every remaining node is too deep to reach the goal within the memory
+                break
+
+            current_state = node.state
+            if current_state == goal_state:
+                path_list = [current_state]
+                parent = current_state._parent
+                while parent is not None:
+                    path_list.append(parent)
+                    parent = parent._parent
+                path_list.reverse()
+                if stats is not None and stats.on_solution is not None:
+                    stats.on_solution(path_list)
+                return SearchResult(path_list, closed_list, time.perf_counter() - start_time)
 
-        def has_smaller_f_in_list(state, state_list) -> bool:
-            """ Checks if there exists a smaller value for f in the given list
+            node.in_open = False
+            closed_list.append(current_state)
+            if stats is not None:
+                stats.expanded += 1
+                if stats.on_expand is not None:
+                    stats.on_expand(current_state)
+
+            # Generate the successors that are not in memory: all of them the first time, then the forgotten ones
+            parent_packed = node.parent.state.packed if node.parent is not None else None
+            successors = []
+            for move_index, move in enumerate(moves):
+                if move_index in node.children or (node.expanded and move_index not in node.forgotten):
+                    continue
+                state = current_state._swap(move[0], move[1])
+                if state.packed == parent_packed:
+                    continue
+                state.update_f_value(heuristic_func, goal_state)
+                if move_index in node.forgotten:
+                    child_f = node.forgotten.pop(move_index)
+                elif state != goal_state and state.level >= max_nodes - 1:
+                    child_f = infinity
+                else:
+                    child_f = max(node.f, state.get_f_value()[0])
+                successors.append((child_f, move_index, state))
+                if stats is not None:
+                    stats.generated += 1
+                    if stats.on_generate is not None:
+                        stats.on_generate(state)
+
+            # Make room for the successors first, by evicting the worst leaves, so the tree never goes over max_nodes
+            while node_count + len(successors) > max_nodes and evict_worst(node):
+                pass
+            # The successors that still do not fit are forgotten straight away, best ones kept first
+            successors.sort(key=lambda successor: successor[0])
+            for child_f, move_index, state in successors:
+                if node_count < max_nodes:
+                    child = _SMANode(state, child_f, node, move_index)
+                    node.children[move_index] = child
+                    node_count += 1
+                    push(child)
+                else:
+                    node.forgotten[move_index] = child_f
+            node.expanded = True
+            if not node.children and not node.forgotten:
+                # A dead end stays as an evictable leaf
+                node.f = infinity
+                push(node)
+
+            # Back the f values up: a node is as good as its best successor, in memory or forgotten
+            ancestor = node
+            while ancestor is not None and ancestor.expanded:
+                values = [child.f for child in ancestor.children.values()]
+                values.extend(ancestor.forgotten.values())
+                new_f = min(values) if values else infinity
+                if new_f <= ancestor.f:
+                    break
+                ancestor.f = new_f
+                if ancestor.in_open:
+                    push(ancestor)
+                ancestor = ancestor.parent
+            if node.forgotten and not node.in_open:
+                # Some successors did not fit, so the node must be expanded again to generate them
+                push(node)
+            if stats is not None:
+                stats.update_peaks(len(best_heap), node_count)
+
+        return SearchResult([], closed_list, time.perf_counter() - start_time)
 
-            :param state: The given PuzzleState
-            :param state_list: The list to check against
-            :return: True or False
+    @staticmethod
+    def anytime_a_star(start_state, goal_state, heuristic_func, time_limit=60, initial_weight=3.0, weight_step=0.5,
+                       on_solution=None, trace=None, stats=None, budget=None) -> SearchResult:
+        """ Performs the Anytime Repairing A* (ARA*) algorithm.
+
+        A first solution is found quickly by weighted A*, with initial_weight, and then improved by searching again
+        with the weight lowered by weight_step each time, down to 1. Each search reuses the work of the previous
+        one: states whose g value improved after they were expanded are kept aside (instead of being expanded
+        again), and put back in the open list for the next search, whose f values are recomputed with the new
+        weight. A search stops as soon as no open state can lead to a better solution under its weight.
+
+        After each search, the solution is at most bound times as long as the optimal one, with an admissible
+        heuristic, where the bound is the smaller of the weight and the cost of the solution over the smallest
+        g + h of the open states. The algorithm stops once the bound reaches 1, or when it runs out of budget,
+        and returns the best solution found so far.
+
+        :param time_limit: The time limit, used when no budget is given
+        :param start_state: The Starting PuzzleState
+        :param goal_state: The goal state
+        :param heuristic_func: The heuristic function to use for the algorithm
+        :param initial_weight: The weight of the heuristic in the first search. Default is 3.0.
+        :param weight_step: How much the weight is lowered after each solution. Default is 0.5.
+        :param on_solution: A function called after every search with the best solution path so far, the weight of
+                            the search, the bound of the solution and the elapsed time. Default is None.
+        :param trace: A SearchTrace to stream the expanded states to, instead of keeping them in a list. Default is None.
+        :param stats: A SearchStats to fill in with counters and callbacks. Default is None.
+        :param budget: A SearchBudget limiting the time, expanded nodes and live nodes. Default is None.
+        :return: The best solution path, the closed list of every search (or the trace), and the elapsed time of the
+                 algorithm, as a SearchResult. If a budget was exceeded before the first solution, the paths are
+                 None and the result says which budget it was.
+        """
+        if budget is None:
+            budget = SearchBudget(time_limit)
+        weight = max(1, initial_weight)
+        start_state.set_f_value(heuristic_func, goal_state)
+        # Only read once the heuristic has run, since some heuristics set it when they are called
+        reopen_closed = not getattr(heuristic_func, 'monotonic', True)
+
+        def weighted_f(state) -> tuple:
+            """ Gets the f value of a state under the current weight, from the h value it was scored with
+
+            :param state: The PuzzleState
+            :return: The f value and the h value, as a tuple
             """
-            old_state_index = state_list.index(state)
-            old_state = state_list[old_state_index]
-            old_state_f_value = old_state.get_f_value()
-            state_f_value = state.get_f_value()
-            if old_state_f_value > state_f_value:
-                return True
-            return False
-
-        while current_state != goal_state and len(open_list) != 0:
-            elapsed = time.time() - start_time
-            current_state = heapq.heappop(open_list)
-
-            if elapsed > time_limit:
-                return None, None, elapsed
-
-            for start in range(1, highest_value + 1):
-                next_best_states = current_state.get_next_states(start)
-                for state in next_best_states:
-                    state.set_f_value(heuristic_func, goal_state)
-                    if state in closed_list:
-                        if (hasattr(heuristic_func, 'monotonic') and 
-                                not heuristic_func.monotonic and 
-                                has_smaller_f_in_list(state, closed_list)):
-                            heapq.heappush(open_list, state)
-                    elif state in open_list:
-                        compare_and_replace_state_in_heap(state, open_list)
-                    else:
-                        heapq.heappush(open_list, state)
+            h_value = state._f_value[1]
+            return h_value * weight + state.level, h_value
+
+        goal_key = goal_state.packed
+        # The state with the best known g value, for every state seen so far
+        best = {start_state.packed: start_state}
+        open_keys = {start_state.packed}
+        open_list = BucketQueue()
+        open_list.push(weighted_f(start_state), start_state)
+        closed_set = set()
+        inconsistent = set()
+        closed_list = [] if trace is None else trace
+        path_list = None
+
+        start_time = time.perf_counter()
+        next_check = 0
+        while True:
+            # Expand states until none of them can lead to a better solution than the current one
+            while open_list:
+                current_state = open_list.peek()
+                current_key = current_state.packed
+                if current_key not in open_keys or best[current_key] is not current_state:
+                    # A better path to this state was found after this entry was pushed
+                    open_list.pop()
+                    continue
+                if goal_key in best and weighted_f(current_state)[0] >= best[goal_key].level:
+                    break
+
+                if len(closed_list) >= next_check:
+                    elapsed = time.perf_counter() - start_time
+                    exceeded = budget.exceeded(elapsed, len(closed_list), len(best))
+                    if exceeded is not None:
+                        if path_list is None:
+                            return SearchResult(None, None, elapsed, exceeded)
+                        return SearchResult(path_list, closed_list, elapsed)
+                    next_check = budget.next_check(len(closed_list))
+
+                open_list.pop()
+                open_keys.discard(current_key)
+                closed_set.add(current_key)
+                closed_list.append(current_state)
+                if stats is not None:
+                    stats.heap_pops += 1
+                    stats.expanded += 1
+                    stats.update_peaks(len(open_keys), len(closed_set))
+                    if stats.on_expand is not None:
+                        stats.on_expand(current_state)
+
+                for state in current_state.successors():
+                    if stats is not None:
+                        stats.generated += 1
+                        if stats.on_generate is not None:
+                            stats.on_generate(state)
+                    key = state.packed
+                    old_state = best.get(key)
+                    if old_state is not None and state.level >= old_state.level:
+                        continue
+                    best[key] = state
+                    state.update_f_value(heuristic_func, goal_state)
+                    if key in closed_set:
+                        if not reopen_closed:
+                            inconsistent.add(key)
+                            continue
+                        closed_set.discard(key)
+                        if stats is not None:
+                            stats.reopened += 1
+                    open_keys.add(key)
+                    open_list.push(weighted_f(state), state)
+                    if stats is not None:
+                        stats.heap_pushes += 1
+
+            if goal_key not in best:
+                return SearchResult([], closed_list, time.perf_counter() - start_time)
+
+            goal = best[goal_key]
+            if path_list is None or goal.level < len(path_list) - 1:
+                # Backtrack the goal's ancestors to get the improved path
+                path_list = [goal]
+                parent = goal._parent
+                while parent is not None:
+                    path_list.append(parent)
+                    parent = parent._parent
+                path_list.reverse()
+                if stats is not None and stats.on_solution is not None:
+                    stats.on_solution(path_list)
+
+            lower_bound = min((best[key].level + best[key]._f_value[1] for key in open_keys | inconsistent),
+                              default=goal.level)
+            bound = min(weight, goal.level / lower_bound) if lower_bound > 0 else 1
+            if on_solution is not None:
+                on_solution(path_list, weight, bound, time.perf_counter() - start_time)
+            if bound <= 1:
+                return SearchResult(path_list, closed_list, time.perf_counter() - start_time)
+
+            # Search again with a lower weight, from every open or inconsistent state
+            weight = max(1, weight - weight_step)
+            open_keys |= inconsistent
+            inconsistent.clear()
+            closed_set.clear()
+            open_list = BucketQueue()
+            for key in open_keys:
+                open_list.push(weighted_f(best[key]), best[key])
 
-            closed_list.append(current_state)
+    @staticmethod
+    def greedy_best_first(start_state, goal_state, heuristic_func, time_limit=60, trace=None, stats=None,
+                          budget=None) -> SearchResult:
+        """ Performs the greedy best-first search.
 
-        if len(open_list) == 0:
-            return [], closed_list, elapsed
-        elif len(open_list) == 1:
-            return open_list, closed_list, elapsed
+        States are expanded in the order of their h value alone, so the search heads straight for the goal and
+        finds a solution much sooner than A* on large boards, with no bound on its length. Every state is only
+        opened once, the first time it is generated.
+
+        :param time_limit: The time limit, used when no budget is given
+        :param start_state: The Starting PuzzleState
+        :param goal_state: The goal state
+        :param heuristic_func: The heuristic function to use for the algorithm
+        :param trace: A SearchTrace to stream the expanded states to, instead of keeping them in a list. Default is None.
+        :param stats: A SearchStats to fill in with counters and callbacks. Default is None.
+        :param budget: A SearchBudget limiting the time, expanded nodes and live nodes. Default is None.
+        :return: The solution path, the closed list (or the trace), and the elapsed time of the algorithm, as a
+                 SearchResult. If a budget was exceeded, the paths are None and the result says which budget it was.
+        """
+        if budget is None:
+            budget = SearchBudget(time_limit)
+        start_state.set_f_value(heuristic_func, goal_state)
+        # Ordered by h, then by g so that the shallowest state comes first on ties
+        open_list = BucketQueue()
+        open_list.push((start_state.get_f_value()[1], start_state.level), start_state)
+        seen = {start_state.packed}
+        closed_list = [] if trace is None else trace
+
+        start_time = time.perf_counter()
+        next_check = 0
+        while open_list:
+            if len(closed_list) >= next_check:
+                elapsed = time.perf_counter() - start_time
+                exceeded = budget.exceeded(elapsed, len(closed_list), len(open_list) + len(closed_list))
+                if exceeded is not None:
+                    return SearchResult(None, None, elapsed, exceeded)
+                next_check = budget.next_check(len(closed_list))
+
+            current_state = open_list.pop()
+            closed_list.append(current_state)
+            if stats is not None:
+                stats.heap_pops += 1
+                stats.expanded += 1
+                stats.update_peaks(len(open_list), len(closed_list))
+                if stats.on_expand is not None:
+                    stats.on_expand(current_state)
+            if current_state == goal_state:
+                break
+
+            for state in current_state.successors():
+                if stats is not None:
+                    stats.generated += 1
+                    if stats.on_generate is not None:
+                        stats.on_generate(state)
+                if state.packed in seen:
+                    continue
+                seen.add(state.packed)
+                state.update_f_value(heuristic_func, goal_state)
+                open_list.push((state.get_f_value()[1], state.level), state)
+                if stats is not None:
+                    stats.heap_pushes += 1
+        else:
+            return SearchResult([], closed_list, time.perf_counter() - start_time)
 
         # Backtrack last state's ancestor to get path
-        last_state = closed_list[-1]
-        path_list = [last_state]
-        
-        parent = last_state._parent
+        path_list = [current_state]
+        parent = current_state._parent
         while parent is not None:
             path_list.append(parent)
             parent = parent._parent
         path_list.reverse()
+        if stats is not None and stats.on_solution is not None:
+            stats.on_solution(path_list)
+
+        return SearchResult(path_list, closed_list, time.perf_counter() - start_time)
+
+    @staticmethod
+    def beam_search(start_state, goal_state, heuristic_func, beam_width: int = 100, time_limit=60, trace=None,
+                    stats=None, budget=None) -> SearchResult:
+        """ Performs the beam search.
+
+        The search goes one layer (one more swap) at a time, like a breadth-first search, but only keeps the
+        beam_width successors with the lowest h value of each layer. The packed form of every state seen is kept
+        in a set, so a state is never added to a layer twice. Memory and time per layer stay bounded by the width,
+        at the cost of missing the goal when every path to it leaves the beam.
 
-        return path_list, closed_list, elapsed
+        :param time_limit: The time limit, used when no budget is given
+        :param start_state: The Starting PuzzleState
+        :param goal_state: The goal state
+        :param heuristic_func: The heuristic function to use for the algorithm
+        :param beam_width: The number of states kept in each layer. Default is 100.
+        :param trace: A SearchTrace to stream the expanded states to, instead of keeping them in a list. Default is None.
+        :param stats: A SearchStats to fill in with counters and callbacks. Default is None.
+        :param budget: A SearchBudget limiting the time, expanded nodes and live nodes. Default is None.
+        :return: The solution path, the closed list (or the trace), and the elapsed time of the algorithm, as a
+                 SearchResult. If a budget was exceeded, the paths are None and the result says which budget it was.
+        """
+        if budget is None:
+            budget = SearchBudget(time_limit)
+        start_state.set_f_value(heuristic_func, goal_state)
+        layer = [start_state]
+        seen = {start_state.packed}
+        closed_list = [] if trace is None else trace
+
+        start_time = time.perf_counter()
+        next_check = 0
+        while layer:
+            children = []
+            for current_state in layer:
+                if len(closed_list) >= next_check:
+                    elapsed = time.perf_counter() - start_time
+                    exceeded = budget.exceeded(elapsed, len(closed_list), len(layer) + len(closed_list))
+                    if exceeded is not None:
+                        return SearchResult(None, None, elapsed, exceeded)
+                    next_check = budget.next_check(len(closed_list))
+
+                closed_list.append(current_state)
+                if stats is not None:
+                    stats.expanded += 1
+                    if stats.on_expand is not None:
+                        stats.on_expand(current_state)
+                if current_state == goal_state:
+                    path_list = [current_state]
+                    parent = current_state._parent
+                    while parent is not None:
+                        path_list.append(parent)
+                        parent = parent._parent
+                    path_list.reverse()
+                    if stats is not None and stats.on_solution is not None:
+                        stats.on_solution(path_list)
+                    return SearchResult(path_list, closed_list, time.perf_counter() - start_time)
+
+                for state in current_state.successors():
+                    if stats is not None:
+                        stats.generated += 1
+                        if stats.on_generate is not None:
+                            stats.on_generate(state)
+                    if state.packed in seen:
+                        continue
+                    seen.add(state.packed)
+                    state.update_f_value(heuristic_func, goal_state)
+                    children.append(state)
+
+            layer = heapq.nsmallest(beam_width, children, key=lambda state: state.get_f_value()[1])
+            if stats is not None:
+                stats.update_peaks(len(layer), len(closed_list))
+
+        return SearchResult([], closed_list, time.perf_counter() - start_time)
 
     @staticmethod
-    def depth_first_search(start, goal, max_iter: int = -1, time_limit=60) -> tuple:
+    def depth_first_search(start, goal, max_iter: int = -1, time_limit=60, path_checking: bool = False,
+                           trace=None, stats=None, budget=None, cache=None) -> SearchResult:
         """ Performs the Depth First Search algorithm
 
-        :param time_limit: The time limit
+        Children are generated lazily: the stack holds the index in the swap table of the next successor of
+        every state on the current path, and a state is expanded as soon as it is generated. Visited states
+        are tracked in a set of packed states. With max_iter, they are tracked with the shallowest level they
+        were expanded at instead, and a state reached again at a shallower level is expanded again, since it
+        can then go deeper before the limit. In path checking mode, only the states on the current path are
+        tracked, so the duplicate detection stays as small as the path, at the cost of re-exploring states
+        reached by different paths. The closed list is a NodeTable (see node_table.py), so only the states on
+        the current path are kept as PuzzleStates. In path checking mode, the expanded states are only counted,
+        so the memory of the search stays bounded by the depth of the path.
+
+        The search stops once it goes over its budget, which is only checked every few expanded nodes.
+
+        :param time_limit: The time limit, used when no budget is given
         :param start: The starting PuzzleState
         :param goal: The goal state
         :param max_iter: the maximum number of iteration to perform. Default is -1.
-        :return: The open list, the closed list, and the elapsed time of the algorithm, all as a tuple.
+        :param path_checking: Whether to only detect cycles against the current path. Default is False.
+        :param trace: A SearchTrace to stream the expanded states to, instead of keeping them in a list. Default is None.
+                      Without one, path checking only counts the expanded states.
+        :param stats: A SearchStats to fill in with counters, phase times and callbacks. Default is None.
+        :param budget: A SearchBudget limiting the time, expanded nodes and live nodes. Default is None.
+        :param cache: A SolutionCache to look the solution up in before searching, and to store it in after. Only
+                      used without max_iter. A solution found in the cache comes with an empty closed list.
+                      Default is None.
+        :return: The solution path, the closed list (or the counter of expanded states, or the trace), and the
+                 elapsed time of the algorithm, as a SearchResult. If a budget was exceeded, the paths are None and
+                 the result says which budget it was.
         """
-        open_list = []
-        closed_list = []
-        open_list.append(start)
+        def solution_from(state) -> list:
+            """ Backtracks the given state's ancestors to get the solution path
 
-        start_time = time.time()
-        elapsed = 0.0
-        while open_list:
-            elapsed = time.time() - start_time
-            if elapsed > time_limit:
-                return None, None, elapsed
+            :param state: The goal PuzzleState reached by the search
+            :return: The solution path
+            """
+            solution_path = [state]
+            parent = state._parent
+            while parent:
+                solution_path.append(parent)
+                parent = parent._parent
+            solution_path.reverse()
+            return solution_path
+
+        if budget is None:
+            budget = SearchBudget(time_limit)
+        if max_iter != -1:
+            cache = None
+        solver = 'depth_first_search/path_checking' if path_checking else 'depth_first_search'
+        timing = stats is not None and stats.timing
+        if trace is not None:
+            closed_list = trace
+        elif path_checking:
+            closed_list = ExpansionCounter()
+        else:
+            # The expanded states are stored in a table without their parents, which the current path keeps alive
+            closed_list = NodeTable(start, _swap_moves(start.size))
+        start_time = time.perf_counter()
+        if cache is not None:
+            solution_path = cache.lookup(solver, start, goal)
+            if solution_path is not None:
+                if stats is not None and stats.on_solution is not None:
+                    stats.on_solution(solution_path)
+                return SearchResult(solution_path, closed_list, time.perf_counter() - start_time)
+
+        closed_list.append(start)
+        # Not len(closed_list): a trace may already hold the states of earlier searches, like the previous passes
+        # of iterative deepening
+        expanded = 1
+        depth_limited = max_iter != -1 and not path_checking
+        # packed state: shallowest level it was expanded at, when depth limited
+        visited = {start.packed: start._level} if depth_limited else {start.packed}
+        if stats is not None:
+            stats.expanded += 1
+            if stats.on_expand is not None:
+                stats.on_expand(start)
+
+        if start == goal:
+            if stats is not None and stats.on_solution is not None:
+                stats.on_solution([start])
+            return SearchResult([start], closed_list, time.perf_counter() - start_time)
+
+        size = start.size
+        bits = _tile_bits(size)
+        mask = (1 << bits) - 1
+        moves = _swap_moves(size)
+        path = [start]
+        # The index in the swap table of the next successor to generate, for every state on the path
+        cursors = [0] if max_iter == -1 or start._level < max_iter else []
+        next_check = 0
+        while cursors:
+            if expanded >= next_check:
+                elapsed = time.perf_counter() - start_time
+                exceeded = budget.exceeded(elapsed, expanded, expanded + len(path))
+                if exceeded is not None:
+                    return SearchResult(None, None, elapsed, exceeded)
+                next_check = budget.next_check(expanded)
+
+            if timing:
+                mark = time.perf_counter()
+            cursor = cursors[-1]
+            if cursor == len(moves):
+                cursors.pop()
+                finished_state = path.pop()
+                if path_checking:
+                    visited.discard(finished_state.packed)
+                continue
+            cursors[-1] = cursor + 1
+            parent_state = path[-1]
+            packed = parent_state._packed
+            move = moves[cursor]
+            first_shift = move[0] * bits
+            second_shift = move[1] * bits
+            diff = ((packed >> first_shift) ^ (packed >> second_shift)) & mask
+            current_state = PuzzleState._from_packed(packed ^ ((diff << first_shift) | (diff << second_shift)),
+                                                     size, parent_state._level + 1, parent_state, move)
+            if stats is not None:
+                stats.generated += 1
+                if stats.on_generate is not None:
+                    stats.on_generate(current_state)
+                if timing:
+                    mark = stats.lap('successors', mark)
+            if depth_limited:
+                level = visited.get(current_state._packed)
+                is_visited = level is not None and level <= current_state._level
+            else:
+                is_visited = current_state._packed in visited
+            if timing:
+                stats.lap('duplicates', mark)
+            if is_visited:
+                continue
 
-            current_state = open_list.pop()
             closed_list.append(current_state)
+            expanded += 1
+            if stats is not None:
+                stats.expanded += 1
+                stats.update_peaks(len(path), len(visited))
+                if stats.on_expand is not None:
+                    stats.on_expand(current_state)
             if current_state == goal:
-                solution_path = [current_state]
-                parent = current_state._parent
-                while parent:
-                    solution_path.append(parent)
-                    parent = parent._parent
-                solution_path.reverse()
-                return solution_path, closed_list, elapsed
-            else:
-                if max_iter == -1 or current_state._level < max_iter:
-                    state_children = ([current_state.get_next_states(i)[j]
-                                       for i in range(1, (start.size ** 2) + 1)
-                                       for j in range(len(current_state.get_next_states(i)))
-                                       ])
-                    for children in state_children:
-                        if children not in open_list and children not in closed_list:
-                            open_list.append(children)
-        return None, closed_list, elapsed
+                solution_path = solution_from(current_state)
+                if stats is not None and stats.on_solution is not None:
+                    stats.on_solution(solution_path)
+                if cache is not None:
+                    cache.store(solver, solution_path, goal)
+                return SearchResult(solution_path, closed_list, time.perf_counter() - start_time)
+
+            if depth_limited:
+                visited[current_state._packed] = current_state._level
+            elif not path_checking:
+                visited.add(current_state._packed)
+            if max_iter == -1 or current_state._level < max_iter:
+                if path_checking:
+                    visited.add(current_state._packed)
+                path.append(current_state)
+                cursors.append(0)
+        return SearchResult(None, closed_list, time.perf_counter() - start_time)
 
     @staticmethod
-    def iterative_deepening(start, goal, max_depth: int, time_limit=60) -> tuple:
+    def bidirectional_search(start, goal, heuristic_func=None, time_limit=60, trace=None, stats=None,
+                             budget=None) -> SearchResult:
+        """ Performs a bidirectional search, growing one frontier from the start and one from the goal.
+
+        Every swap is its own inverse, so the backward search uses the same successors as the forward one.
+        Each direction keeps a dict of the states it has reached, indexed by packed state, and a state
+        generated by one direction is checked against the other direction's dict to detect where they meet.
+        The two parent chains are then stitched into one solution path from the start to the goal.
+
+        Without a heuristic, this is a breadth-first search that expands a whole layer of the smaller frontier
+        at a time. With a heuristic, this is a bidirectional A*: the forward search is guided towards the goal
+        and the backward search towards the start, and it stops once the best meeting found is no more
+        expensive than the smallest f value of either frontier.
+
+        The search stops once it goes over its budget, which is only checked every few expanded nodes.
+
+        :param start: The starting PuzzleState
+        :param goal: The goal state
+        :param heuristic_func: The heuristic function to use for the algorithm. Default is None, for breadth-first.
+        :param time_limit: The time limit, used when no budget is given
+        :param trace: A SearchTrace to stream the expanded states to, instead of keeping them in a list. Default is None.
+        :param stats: A SearchStats to fill in with counters and callbacks. Default is None.
+        :param budget: A SearchBudget limiting the time, expanded nodes and live nodes. Default is None.
+        :return: The solution path, the closed list (or the trace), and the elapsed time of the algorithm, as a
+                 SearchResult. If a budget was exceeded, the paths are None and the result says which budget it was.
+        """
+        if budget is None:
+            budget = SearchBudget(time_limit)
+        start_time = time.perf_counter()
+        closed_list = [] if trace is None else trace
+        if start == goal:
+            closed_list.append(start)
+            if stats is not None:
+                stats.expanded += 1
+                if stats.on_expand is not None:
+                    stats.on_expand(start)
+                if stats.on_solution is not None:
+                    stats.on_solution([start])
+            return SearchResult([start], closed_list, time.perf_counter() - start_time)
+
+        backward_start = PuzzleState._from_packed(goal.packed, goal.size)
+        if heuristic_func is None:
+            result = PuzzleState._bidirectional_breadth_first(start, backward_start, start_time, budget,
+                                                              closed_list, stats)
+        else:
+            result = PuzzleState._bidirectional_a_star(start, backward_start, heuristic_func, start_time, budget,
+                                                       closed_list, stats)
+        if result.solution_path and stats is not None and stats.on_solution is not None:
+            stats.on_solution(result.solution_path)
+        return result
+
+    @staticmethod
+    def _bidirectional_breadth_first(start, backward_start, start_time: float, budget, closed_list,
+                                     stats) -> SearchResult:
+        """ Performs the breadth-first variant of bidirectional_search()
+
+        :param start: The starting PuzzleState
+        :param backward_start: A copy of the goal state, to start the backward search from
+        :param start_time: The time the search started at
+        :param budget: The SearchBudget
+        :param closed_list: The list (or SearchTrace) to record the expanded states in
+        :param stats: The SearchStats to fill in, or None
+        :return: The solution path, the closed list, and the elapsed time of the algorithm, as a SearchResult
+        """
+        reached = ({start.packed: start}, {backward_start.packed: backward_start})
+        frontiers = ([start], [backward_start])
+        expanded = 0
+        next_check = 0
+
+        while frontiers[0] and frontiers[1]:
+            direction = 0 if len(frontiers[0]) <= len(frontiers[1]) else 1
+            own_reached = reached[direction]
+            other_reached = reached[1 - direction]
+            next_frontier = []
+            meeting = None
+            meeting_cost = float('inf')
+
+            for state in frontiers[direction]:
+                if expanded >= next_check:
+                    elapsed = time.perf_counter() - start_time
+                    exceeded = budget.exceeded(elapsed, expanded, len(reached[0]) + len(reached[1]))
+                    if exceeded is not None:
+                        return SearchResult(None, None, elapsed, exceeded)
+                    next_check = budget.next_check(expanded)
+
+                closed_list.append(state)
+                expanded += 1
+                if stats is not None:
+                    stats.expanded += 1
+                    stats.update_peaks(len(frontiers[direction]) + len(next_frontier), expanded)
+                    if stats.on_expand is not None:
+                        stats.on_expand(state)
+                for child in state.successors():
+                    if stats is not None:
+                        stats.generated += 1
+                        if stats.on_generate is not None:
+                            stats.on_generate(child)
+                    packed = child.packed
+                    if packed in own_reached:
+                        continue
+                    own_reached[packed] = child
+                    next_frontier.append(child)
+
+                    other = other_reached.get(packed)
+                    if other is not None and child.level + other.level < meeting_cost:
+                        meeting_cost = child.level + other.level
+                        meeting = (child, other) if direction == 0 else (other, child)
+
+            # Finishing the layer first makes sure the shortest meeting of this layer is kept
+            if meeting is not None:
+                return SearchResult(PuzzleState._stitch_paths(*meeting), closed_list,
+                                    time.perf_counter() - start_time)
+            frontiers = (next_frontier, frontiers[1]) if direction == 0 else (frontiers[0], next_frontier)
+
+        return SearchResult([], closed_list, time.perf_counter() - start_time)
+
+    @staticmethod
+    def _bidirectional_a_star(start, backward_start, heuristic_func, start_time: float, budget, closed_list,
+                              stats) -> SearchResult:
+        """ Performs the heuristic variant of bidirectional_search()
+
+        Each direction works like a_star(): a BucketQueue with lazy deletion, and a dict of the best g value of
+        each state. The direction with the smaller open list is expanded first.
+
+        :param start: The starting PuzzleState
+        :param backward_start: A copy of the goal state, to start the backward search from
+        :param heuristic_func: The heuristic function to use for the algorithm
+        :param start_time: The time the search started at
+        :param budget: The SearchBudget
+        :param closed_list: The list (or SearchTrace) to record the expanded states in
+        :param stats: The SearchStats to fill in, or None
+        :return: The solution path, the closed list, and the elapsed time of the algorithm, as a SearchResult
+        """
+        targets = (backward_start, start)
+        open_lists = (BucketQueue(), BucketQueue())
+        best_g = ({}, {})
+        best_states = ({}, {})
+        closed_sets = (set(), set())
+
+        for direction, root in enumerate((start, backward_start)):
+            root.set_f_value(heuristic_func, targets[direction])
+            open_lists[direction].push(root.get_f_value(), root)
+            best_g[direction][root.packed] = root.level
+            best_states[direction][root.packed] = root
+        reopen_closed = not getattr(heuristic_func, 'monotonic', True)
+
+        def smallest_f(direction: int):
+            """ Drops the stale entries on top of an open list and gets the smallest f value left in it
+
+            :param direction: 0 for the forward search, 1 for the backward search
+            :return: The smallest f value, or None if the open list is empty
+            """
+            open_list = open_lists[direction]
+            while open_list and open_list.peek().level > best_g[direction][open_list.peek().packed]:
+                open_list.pop()
+                if stats is not None:
+                    stats.heap_pops += 1
+            return open_list.peek().get_f_value()[0] if open_list else None
+
+        meeting = None
+        meeting_cost = float('inf')
+        expanded = 0
+        next_check = 0
+
+        while True:
+            if expanded >= next_check:
+                elapsed = time.perf_counter() - start_time
+                exceeded = budget.exceeded(elapsed, expanded, len(best_g[0]) + len(best_g[1]))
+                if exceeded is not None:
+                    return SearchResult(None, None, elapsed, exceeded)
+                next_check = budget.next_check(expanded)
+
+            forward_f = smallest_f(0)
+            backward_f = smallest_f(1)
+            if forward_f is None or backward_f is None or meeting_cost <= max(forward_f, backward_f):
+                break
+
+            direction = 0 if len(open_lists[0]) <= len(open_lists[1]) else 1
+            current_state = open_lists[direction].pop()
+            closed_sets[direction].add(current_state.packed)
+            closed_list.append(current_state)
+            expanded += 1
+            if stats is not None:
+                stats.heap_pops += 1
+                stats.expanded += 1
+                stats.update_peaks(len(open_lists[0]) + len(open_lists[1]),
+                                   len(closed_sets[0]) + len(closed_sets[1]))
+                if stats.on_expand is not None:
+                    stats.on_expand(current_state)
+
+            own_g = best_g[direction]
+            other_g = best_g[1 - direction]
+            for state in current_state.successors():
+                if stats is not None:
+                    stats.generated += 1
+                    if stats.on_generate is not None:
+                        stats.on_generate(state)
+                packed = state.packed
+                old_g = own_g.get(packed)
+                if old_g is not None and state.level >= old_g:
+                    continue
+                if packed in closed_sets[direction]:
+                    if not reopen_closed:
+                        continue
+                    closed_sets[direction].discard(packed)
+                    if stats is not None:
+                        stats.reopened += 1
+                own_g[packed] = state.level
+                best_states[direction][packed] = state
+                state.update_f_value(heuristic_func, targets[direction])
+                open_lists[direction].push(state.get_f_value(), state)
+                if stats is not None:
+                    stats.heap_pushes += 1
+
+                if packed in other_g and state.level + other_g[packed] < meeting_cost:
+                    meeting_cost = state.level + other_g[packed]
+                    other = best_states[1 - direction][packed]
+                    meeting = (state, other) if direction == 0 else (other, state)
+
+        if meeting is None:
+            return SearchResult([], closed_list, time.perf_counter() - start_time)
+
+        solution_path = PuzzleState._stitch_paths(*meeting)
+        for state in solution_path:
+            state.set_f_value(heuristic_func, targets[0])
+        return SearchResult(solution_path, closed_list, time.perf_counter() - start_time)
+
+    @staticmethod
+    def _stitch_paths(forward_state, backward_state) -> list:
+        """ Joins the ancestors of 2 states that hold the same board into a single path
+
+        The backward ancestors are copied into new PuzzleStates whose parents go back to the start,
+        so the path has the same shape as the one of a forward search.
+
+        :param forward_state: The meeting state, as reached from the start
+        :param backward_state: The meeting state, as reached from the goal
+        :return: The solution path, from the start to the goal
+        """
+        path = [forward_state]
+        parent = forward_state._parent
+        while parent is not None:
+            path.append(parent)
+            parent = parent._parent
+        path.reverse()
+
+        previous = forward_state
+        state = backward_state
+        while state._parent is not None:
+            previous = PuzzleState._from_packed(state._parent.packed, previous.size, previous.level + 1,
+                                                previous, state._swapped)
+            path.append(previous)
+            state = state._parent
+        return path
+
+    @staticmethod
+    def iterative_deepening(start, goal, max_depth: int, time_limit=60, trace=None, stats=None,
+                            budget=None, cache=None) -> SearchResult:
         """ Performs the Depth First Search algorithm, this time with iterative deepening
 
-        :param time_limit: The time limit
+        :param time_limit: The time limit, used when no budget is given
         :param start: The starting PuzzleState
         :param goal: The goal state
         :param max_depth: The maximum depth to search to
-        :return: The open list, the closed list, and the elapsed time of the algorithm, all as a tuple.
+        :param trace: A SearchTrace to stream the states expanded by every iteration to. Default is None.
+        :param stats: A SearchStats to fill in over every iteration. Default is None.
+        :param budget: A SearchBudget shared by every iteration. Default is None.
+        :param cache: A SolutionCache to look the solution up in before searching, and to store it in after.
+                      A solution found in the cache comes with an empty closed list. Default is None.
+        :return: The solution path, the search path of the last iteration (or the trace), and the elapsed time of
+                 the algorithm, as a SearchResult. If a budget was exceeded, the paths are None and the result says
+                 which budget it was.
         """
-        search_path = []
-        start_time = time.time()
-        elapsed = 0.0
+        if budget is None:
+            budget = SearchBudget(time_limit)
+        search_path = [] if trace is None else trace
+        expanded = 0
+        start_time = time.perf_counter()
+        if cache is not None:
+            solution_path = cache.lookup('iterative_deepening', start, goal)
+            if solution_path is not None and len(solution_path) - 1 <= max_depth:
+                return SearchResult(solution_path, search_path, time.perf_counter() - start_time)
 
         for i in range(max_depth + 1):
             # time.sleep(0.1)  # Demonstrates that Iterative Deepening really is just fast and doesn't take 0.0 seconds
-            elapsed = time.time() - start_time
-            if elapsed > time_limit:
-                return None, None, elapsed
+            elapsed = time.perf_counter() - start_time
+            result = PuzzleState.depth_first_search(start, goal, i, trace=trace, stats=stats,
+                                                    budget=budget.remaining(elapsed, expanded))
+            if result.exceeded is not None:
+                return SearchResult(None, None, time.perf_counter() - start_time, result.exceeded)
 
-            solution_path, search_path, _ = PuzzleState.depth_first_search(start, goal, i, time_limit)
+            solution_path, search_path, _ = result
             if solution_path:
-                return solution_path, search_path, elapsed
-        return None, search_path, elapsed
+                if cache is not None:
+                    cache.store('iterative_deepening', solution_path, goal)
+                return SearchResult(solution_path, search_path, time.perf_counter() - start_time)
+            expanded = len(trace) if trace is not None else expanded + len(search_path)
+        return SearchResult(None, search_path, time.perf_counter() - start_time)
+
+    @staticmethod
+    def ida_star(start, goal, heuristic_func, max_f_value: int = -1, time_limit=60, stats=None, budget=None,
+                 iteration_counts: list = None) -> SearchResult:
+        """ Performs the Iterative Deepening A* algorithm.
+
+        Each iteration is a depth-first search, using an explicit stack, that cuts off every state whose f value
+        is above the current threshold. The next threshold is the smallest f value that was cut off.
+        Only the current path and the children of the states on it are kept in memory. The move that
+        produced a state is never applied again to it (every swap is its own inverse), and states already
+        on the current path are skipped.
+
+        The search stops once it goes over its budget, shared by every iteration, which is only checked every
+        few expanded nodes.
+
+        :param start: The starting PuzzleState
+        :param goal: The goal state
+        :param heuristic_func: The heuristic function to use for the algorithm
+        :param max_f_value: The largest threshold to search with. This bounds the f value of the states, not their
+                            depth. Default is -1, for no maximum.
+        :param time_limit: The time limit, used when no budget is given
+        :param stats: A SearchStats to fill in with counters, phase times and callbacks. Default is None.
+        :param budget: A SearchBudget limiting the time, expanded nodes and live nodes. Default is None.
+        :param iteration_counts: A list to append the (threshold, number of nodes expanded) of every iteration to.
+                                 Default is None.
+        :return: The solution path, an empty search path (no closed list is kept), and the elapsed time of the
+                 algorithm, as a SearchResult. If a budget was exceeded, the paths are None and the result says
+                 which budget it was.
+        """
+        timing = stats is not None and stats.timing
+
+        def ordered_children(state):
+            """ Gets the children of the given state, without its parent, with the lowest f value first
+
+            :param state: The PuzzleState to expand
+            :return: An iterator over the children
+            """
+            if timing:
+                mark = time.perf_counter()
+            children = [child for child in state.successors() if child._swapped != state._swapped]
+            if stats is not None:
+                stats.generated += len(children)
+                if stats.on_generate is not None:
+                    for child in children:
+                        stats.on_generate(child)
+                if timing:
+                    mark = stats.lap('successors', mark)
+            for child in children:
+                child.update_f_value(heuristic_func, goal)
+            if timing:
+                mark = stats.lap('heuristic', mark)
+            children.sort(key=PuzzleState.get_f_value)
+            if timing:
+                stats.lap('queue', mark)
+            return iter(children)
+
+        if budget is None:
+            budget = SearchBudget(time_limit)
+        if iteration_counts is None:
+            iteration_counts = []
+        start_time = time.perf_counter()
+        start.set_f_value(heuristic_func, goal)
+        threshold = start.get_f_value()[0]
+
+        if start == goal:
+            if stats is not None:
+                stats.expanded += 1
+                if stats.on_expand is not None:
+                    stats.on_expand(start)
+                if stats.on_solution is not None:
+                    stats.on_solution([start])
+            return SearchResult([start], [], time.perf_counter() - start_time)
+
+        # Counted over every iteration, for the budget
+        total_expanded = 0
+        next_check = 0
+        while max_f_value == -1 or threshold <= max_f_value:
+            # Every iteration expands the start state again
+            expanded = 1
+            total_expanded += 1
+            if stats is not None:
+                stats.expanded += 1
+                if stats.on_expand is not None:
+                    stats.on_expand(start)
+            next_threshold = float('inf')
+            path = [start]
+            on_path = {start.packed}
+            stack = [ordered_children(start)]
+
+            while stack:
+                if total_expanded >= next_check:
+                    elapsed = time.perf_counter() - start_time
+                    exceeded = budget.exceeded(elapsed, total_expanded, len(path))
+                    if exceeded is not None:
+                        return SearchResult(None, None, elapsed, exceeded)
+                    next_check = budget.next_check(total_expanded)
+
+                child = next(stack[-1], None)
+                if child is None:
+                    stack.pop()
+                    on_path.discard(path.pop().packed)
+                    continue
+                if child.packed in on_path:
+                    continue
+
+                f_value = child.get_f_value()[0]
+                if f_value > threshold:
+                    next_threshold = min(next_threshold, f_value)
+                    continue
+                if child == goal:
+                    path.append(child)
+                    iteration_counts.append((threshold, expanded))
+                    if stats is not None and stats.on_solution is not None:
+                        stats.on_solution(path)
+                    return SearchResult(path, [], time.perf_counter() - start_time)
+
+                expanded += 1
+                total_expanded += 1
+                path.append(child)
+                on_path.add(child.packed)
+                if stats is not None:
+                    stats.expanded += 1
+                    stats.update_peaks(len(stack), len(path))
+                    if stats.on_expand is not None:
+                        stats.on_expand(child)
+                stack.append(ordered_children(child))
+
+            iteration_counts.append((threshold, expanded))
+            if next_threshold == float('inf'):
+                break
+            threshold = next_threshold
+
+        return SearchResult([], [], time.perf_counter() - start_time)
+
+
+def _hamming_distance_incremental(parent, parent_h, swapped: tuple, goal_state) -> int:
+    """ Derives a child's Hamming distance from its parent's, in O(1)
+
+    :param parent: The parent PuzzleState
+    :param parent_h: The Hamming distance of the parent
+    :param swapped: The row-major indices of the 2 tiles swapped to get the child
+    :param goal_state: The goal state
+    :return: The Hamming distance of the child
+    """
+    first_index, second_index = swapped
+    size = parent.size
+    first_value = _tile_at(parent.packed, size, first_index)
+    second_value = _tile_at(parent.packed, size, second_index)
+    first_goal = _tile_at(goal_state.packed, size, first_index)
+    second_goal = _tile_at(goal_state.packed, size, second_index)
+    before = (first_value != first_goal) + (second_value != second_goal)
+    after = (second_value != first_goal) + (first_value != second_goal)
+    return parent_h + after - before
+
+
+def _manhattan_distance_incremental(parent, parent_h, swapped: tuple, goal_state) -> float:
+    """ Derives a child's modified Manhattan distance from its parent's, in O(1)
+
+    :param parent: The parent PuzzleState
+    :param parent_h: The modified Manhattan distance of the parent
+    :param swapped: The row-major indices of the 2 tiles swapped to get the child
+    :param goal_state: The goal state
+    :return: The modified Manhattan distance of the child
+    """
+    first_index, second_index = swapped
+    size = parent.size
+    goal_indices = _tile_indices(goal_state.packed, size)
+    first_goal = goal_indices[_tile_at(parent.packed, size, first_index)]
+    second_goal = goal_indices[_tile_at(parent.packed, size, second_index)]
+
+    def distance(index, goal_index):
+        row, col = divmod(index, size)
+        goal_row, goal_col = divmod(goal_index, size)
+        return abs(row - goal_row) + abs(col - goal_col)
+
+    before = distance(first_index, first_goal) + distance(second_index, second_goal)
+    after = distance(second_index, first_goal) + distance(first_index, second_goal)
+    return parent_h + (after - before) / 2
+
+
+def _sum_permutation_incremental(parent, parent_h, swapped: tuple, goal_state) -> int:
+    """ Derives a child's sum permutation from its parent's.
+
+    Only pairs involving one of the 2 swapped tiles and a tile between them can change, so this
+    is O(n) for an n-by-n puzzle.
+
+    :param parent: The parent PuzzleState
+    :param parent_h: The sum permutation of the parent
+    :param swapped: The row-major indices of the 2 tiles swapped to get the child
+    :param goal_state: The goal state
+    :return: The sum permutation of the child
+    """
+    first_index, second_index = sorted(swapped)
+    size = parent.size
+    packed = parent.packed
+    goal_indices = _tile_indices(goal_state.packed, size)
+    first_rank = goal_indices[_tile_at(packed, size, first_index)]
+    second_rank = goal_indices[_tile_at(packed, size, second_index)]
+
+    delta = 1 if first_rank < second_rank else -1
+    for index in range(first_index + 1, second_index):
+        rank = goal_indices[_tile_at(packed, size, index)]
+        before = (first_rank > rank) + (rank > second_rank)
+        after = (second_rank > rank) + (rank > first_rank)
+        delta += after - before
+    return parent_h + delta
+
+
+PuzzleState.hamming_distance.incremental = _hamming_distance_incremental
+PuzzleState.manhattan_distance.incremental = _manhattan_distance_incremental
+PuzzleState.sum_permutation.incremental = _sum_permutation_incremental
@@ -0,0 +1,103 @@
+from collections import namedtuple
+
+# The names of the budgets, as given by SearchResult.exceeded
+TIME_BUDGET = 'time'
+NODE_BUDGET = 'nodes'
+MEMORY_BUDGET = 'memory'
+
+# A rough size of a live search node (the PuzzleState, its packed int and f value, and its share of the open
+# and closed lists), measured with tracemalloc on A* and DFS runs. Only used to turn a memory budget into a
+# number of live nodes.
+NODE_BYTES = 512
+
+
+class SearchBudget:
+    """Limits on a search: wall-clock time, expanded nodes, and live nodes (given directly or as memory)
+
+    The searches only check the budget every check_interval expanded nodes, so the clock is not read on every
+    node. A search can therefore go over its budget by up to check_interval expanded nodes, and by what these
+    nodes generate. The expanded node budget itself is always checked right on time.
+    """
+
+    __slots__ = ('time_limit', 'max_expanded', 'max_live', 'check_interval')
+
+    def __init__(self, time_limit=60, max_expanded: int = None, max_live: int = None, max_memory: int = None,
+                 check_interval: int = 256):
+        """ Creates a budget
+
+        :param time_limit: The time limit, in seconds. Default is 60.
+        :param max_expanded: The maximum number of expanded nodes. Default is None, for no limit.
+        :param max_live: The maximum number of nodes kept in the open and closed lists. Default is None.
+        :param max_memory: The maximum estimated memory of the live nodes, in bytes. Default is None.
+        :param check_interval: The number of expanded nodes between two checks of the budget. Default is 256.
+        """
+        if max_memory is not None:
+            max_live_from_memory = max(1, max_memory // NODE_BYTES)
+            max_live = max_live_from_memory if max_live is None else min(max_live, max_live_from_memory)
+        self.time_limit = time_limit
+        self.max_expanded = max_expanded
+        self.max_live = max_live
+        self.check_interval = max(1, check_interval)
+
+    def __getstate__(self):
+        return self.time_limit, self.max_expanded, self.max_live, self.check_interval
+
+    def __setstate__(self, state):
+        self.time_limit, self.max_expanded, self.max_live, self.check_interval = state
+
+    def __repr__(self):
+        return (f"SearchBudget(time_limit={self.time_limit}, max_expanded={self.max_expanded}, "
+                f"max_live={self.max_live}, check_interval={self.check_interval})")
+
+    def next_check(self, expanded: int) -> int:
+        """ Gets the number of expanded nodes at which the budget should be checked next
+
+        :param expanded: The number of nodes expanded so far
+        :return: The number of expanded nodes
+        """
+        next_check = expanded + self.check_interval
+        if self.max_expanded is not None and self.max_expanded < next_check:
+            return max(self.max_expanded, expanded + 1)
+        return next_check
+
+    def exceeded(self, elapsed: float, expanded: int, live: int):
+        """ Checks the budget
+
+        :param elapsed: The time spent so far
+        :param expanded: The number of nodes expanded so far
+        :param live: The number of nodes currently kept by the search
+        :return: The name of the budget that is exceeded, or None if there is none
+        """
+        if elapsed > self.time_limit:
+            return TIME_BUDGET
+        if self.max_expanded is not None and expanded >= self.max_expanded:
+            return NODE_BUDGET
+        if self.max_live is not None and live > self.max_live:
+            return MEMORY_BUDGET
+        return None
+
+    def remaining(self, elapsed: float, expanded: int):
+        """ Gets what is left of the budget once part of it is spent, for searches made of several passes
+
+        :param elapsed: The time spent so far
+        :param expanded: The number of nodes expanded so far
+        :return: The remaining SearchBudget
+        """
+        max_expanded = None if self.max_expanded is None else max(0, self.max_expanded - expanded)
+        return SearchBudget(self.time_limit - elapsed, max_expanded, self.max_live, check_interval=self.check_interval)
+
+
+class SearchResult(namedtuple('SearchResult', ['solution_path', 'search_path', 'elapsed'])):
+    """The (solution path, search path, elapsed time) tuple returned by the budgeted searches
+
+    exceeded is the name of the budget that stopped the search (TIME_BUDGET, NODE_BUDGET or MEMORY_BUDGET),
+    or None if the search ran to completion. A stopped search has no solution path and no search path.
+    """
+
+    def __new__(cls, solution_path, search_path, elapsed, exceeded=None):
+        result = super().__new__(cls, solution_path, search_path, elapsed)
+        result.exceeded = exceeded
+        return result
+
+    def __getnewargs__(self):
+        return tuple(self) + (self.exceeded,)
@@ -0,0 +1,126 @@
+import time
+
+PHASES = ('successors', 'duplicates', 'heuristic', 'queue')
+
+
+class SearchStats:
+    """Collects what a search does: node and queue counters, time per phase, and sampling callbacks
+
+    A search only touches its SearchStats when one is passed in, so searches without one pay a single
+    "is None" check per node. Phase timers are only read when timing is True, since the clock calls are the
+    expensive part. The callbacks, if given, are called with the expanded state (on_expand), with every
+    generated state (on_generate), and with the solution path (on_solution).
+    """
+
+    __slots__ = ('generated', 'expanded', 'reopened', 'heap_pushes', 'heap_pops', 'peak_open', 'peak_closed',
+                 'timing', 'phase_times', 'on_expand', 'on_generate', 'on_solution')
+
+    def __init__(self, timing: bool = False, on_expand=None, on_generate=None, on_solution=None):
+        self.generated = 0
+        self.expanded = 0
+        self.reopened = 0
+        self.heap_pushes = 0
+        self.heap_pops = 0
+        self.peak_open = 0
+        self.peak_closed = 0
+        self.timing = timing
+        self.phase_times = dict.fromkeys(PHASES, 0.0)
+        self.on_expand = on_expand
+        self.on_generate = on_generate
+        self.on_solution = on_solution
+
+    def __getstate__(self):
+        # The callbacks usually cannot be pickled, and are only useful in the process that runs the search
+        return (self.generated, self.expanded, self.reopened, self.heap_pushes, self.heap_pops,
+                self.peak_open, self.peak_closed, self.timing, self.phase_times)
+
+    def __setstate__(self, state):
+        (self.generated, self.expanded, self.reopened, self.heap_pushes, self.heap_pops,
+         self.peak_open, self.peak_closed, self.timing, self.phase_times) = state
+        self.on_expand = None
+        self.on_generate = None
+        self.on_solution = None
+
+    def lap(self, phase: str, mark: float) -> float:
+        """ Adds the time since a given mark to a phase. Only called when timing is True.
+
+        :param phase: The phase to add the time to, one of PHASES
+        :param mark: The time.perf_counter() value the phase started at
+        :return: The current time.perf_counter() value, to use as the mark of the next phase
+        """
+        now = time.perf_counter()
+        self.phase_times[phase] += now - mark
+        return now
+
+    def update_peaks(self, open_size: int, closed_size: int) -> None:
+        """ Keeps track of the largest open and closed lists seen so far
+
+        :param open_size: The current size of the open list
+        :param closed_size: The current size of the closed list
+        :return: None
+        """
+        if open_size > self.peak_open:
+            self.peak_open = open_size
+        if closed_size > self.peak_closed:
+            self.peak_closed = closed_size
+
+    def merge(self, other) -> None:
+        """ Adds the counters and phase times of another SearchStats to this one
+
+        The peak sizes are the largest of the two.
+
+        :param other: The other SearchStats
+        :return: None
+        """
+        self.generated += other.generated
+        self.expanded += other.expanded
+        self.reopened += other.reopened
+        self.heap_pushes += other.heap_pushes
+        self.heap_pops += other.heap_pops
+        self.update_peaks(other.peak_open, other.peak_closed)
+        for phase, seconds in other.phase_times.items():
+            self.phase_times[phase] = self.phase_times.get(phase, 0.0) + seconds
+
+    def summary(self) -> list:
+        """ Describes the statistics, one line per measure
+
+        :return: The lines, as a list of strings
+        """
+        lines = [f"Nodes generated: {self.generated}",
+                 f"Nodes expanded: {self.expanded}",
+                 f"Nodes reopened: {self.reopened}",
+                 f"Heap pushes: {self.heap_pushes}",
+                 f"Heap pops: {self.heap_pops}",
+                 f"Peak open list size: {self.peak_open}",
+                 f"Peak closed list size: {self.peak_closed}"]
+        if self.timing:
+            for phase, seconds in self.phase_times.items():
+                lines.append(f"Time spent on {phase}: {seconds}")
+        return lines
+
+
+class ExpansionCounter:
+    """Stands in for a closed list when only the number of expanded states is needed
+
+    It has the append() and len() of a list, and iterates over nothing, so searches that must stay within a
+    memory bound do not keep every expanded state alive.
+    """
+
+    __slots__ = ('_count',)
+
+    def __init__(self):
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    def __iter__(self):
+        return iter(())
+
+    def append(self, state) -> None:
+        """ Counts an expanded state
+
+        :param state: The expanded PuzzleState
+        :return: None
+        """
+        self._count += 1
@@ -0,0 +1,254 @@
+from puzzle_state import PuzzleState, _tile_bits
+import argparse
+import gzip
+import struct
+
+_MAGIC = b'STRC'
+_GZIP_MAGIC = b'\x1f\x8b'
+
+# The kind of f value stored with each record
+_NO_F_VALUE = 0
+_INT_F_VALUE = 1
+_HALF_F_VALUE = 2
+_FLOAT_F_VALUE = 3
+_FOOTER = 255
+
+
+def _state_bytes(size: int) -> int:
+    """ Gets the number of bytes used to store a packed state of a size-by-size puzzle
+
+    :param size: The size of the puzzle
+    :return: The number of bytes
+    """
+    return (size * size * _tile_bits(size) + 7) // 8
+
+
+def _write_varint(buffer: bytearray, value: int) -> None:
+    """ Appends a non-negative integer to a buffer, 7 bits per byte
+
+    :param buffer: The buffer to write to
+    :param value: The integer to write
+    :return: None
+    """
+    while value > 0x7f:
+        buffer.append((value & 0x7f) | 0x80)
+        value >>= 7
+    buffer.append(value)
+
+
+def _read_varint(data: bytes, offset: int) -> tuple:
+    """ Reads an integer written by _write_varint()
+
+    :param data: The data to read from
+    :param offset: Where the integer starts
+    :return: The integer and the offset right after it, as a tuple
+    """
+    value = 0
+    shift = 0
+    while True:
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return value, offset
+        shift += 7
+
+
+def _f_value_kind(f_value) -> int:
+    """ Gets how a given f value is stored in a trace
+
+    :param f_value: The (f, h) value of a state, or 0 if it has none
+    :return: The kind of f value
+    """
+    if not f_value:
+        return _NO_F_VALUE
+    f, h = f_value
+    if type(f) is int and type(h) is int and f >= 0 and h >= 0:
+        return _INT_F_VALUE
+    if type(f) is float and type(h) is float and f >= 0 and h >= 0 and (f * 2).is_integer() and (h * 2).is_integer():
+        return _HALF_F_VALUE
+    return _FLOAT_F_VALUE
+
+
+class SearchTrace:
+    """Streams the states expanded by a search to a compact binary file
+
+    Each record holds the packed state in a fixed number of bytes, the level as a variable-length integer, and
+    the f value. Half-integral f values (like those of the modified Manhattan distance) are stored doubled, as
+    variable-length integers. Records go through a large in-memory buffer before being written, and the file
+    can be gzip-compressed. A SearchTrace can be passed to the searches instead of keeping a closed list:
+    it has the append() they use, and len() gives the number of expanded states.
+    """
+
+    def __init__(self, trace_file: str, size: int, compress: bool = False, buffer_size: int = 1 << 20):
+        self._state_bytes = _state_bytes(size)
+        self._buffer_size = buffer_size
+        self._buffer = bytearray(_MAGIC)
+        self._buffer.append(size)
+        self._count = 0
+        self._total_cost = 0
+        self.elapsed = 0.0
+        self._file = gzip.open(trace_file, 'wb') if compress else open(trace_file, 'wb')
+
+    def __len__(self):
+        return self._count
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @property
+    def total_cost(self):
+        return self._total_cost
+
+    def append(self, state) -> None:
+        """ Records an expanded state
+
+        :param state: The expanded PuzzleState
+        :return: None
+        """
+        buffer = self._buffer
+        f_value = state.get_f_value()
+        kind = _f_value_kind(f_value)
+        buffer.append(kind)
+        buffer += state.packed.to_bytes(self._state_bytes, 'little')
+        _write_varint(buffer, state.level)
+
+        if kind == _INT_F_VALUE:
+            _write_varint(buffer, f_value[0])
+            _write_varint(buffer, f_value[1])
+        elif kind == _HALF_F_VALUE:
+            _write_varint(buffer, int(f_value[0] * 2))
+            _write_varint(buffer, int(f_value[1] * 2))
+        elif kind == _FLOAT_F_VALUE:
+            buffer += struct.pack('<dd', f_value[0], f_value[1])
+        if kind != _NO_F_VALUE:
+            self._total_cost += f_value[0]
+
+        self._count += 1
+        if len(buffer) >= self._buffer_size:
+            self._file.write(buffer)
+            buffer.clear()
+
+    def close(self) -> None:
+        """ Writes the footer, holding the elapsed time, then flushes and closes the file
+
+        :return: None
+        """
+        if self._file.closed:
+            return
+        self._buffer.append(_FOOTER)
+        self._buffer += struct.pack('<d', self.elapsed)
+        self._file.write(self._buffer)
+        self._buffer.clear()
+        self._file.close()
+
+
+def _open_trace(trace_file: str):
+    """ Opens a trace file for reading, through gzip if it is compressed
+
+    :param trace_file: The path to the trace file
+    :return: The file object, giving the uncompressed bytes
+    """
+    with open(trace_file, 'rb') as file:
+        compressed = file.read(len(_GZIP_MAGIC)) == _GZIP_MAGIC
+    return gzip.open(trace_file, 'rb') if compressed else open(trace_file, 'rb')
+
+
+def read_search_trace(trace_file: str, chunk_size: int = 1 << 20):
+    """ Reads back the states recorded in a trace file, as PuzzleStates with their level and f value
+
+    The file is read (and decompressed) chunk_size bytes at a time, so only one chunk is held in memory, however
+    large the trace is.
+
+    :param trace_file: The path to the trace file, compressed or not
+    :param chunk_size: The number of bytes read at a time. Default is 1 MiB.
+    :return: A generator of the PuzzleStates. Its return value is the elapsed time stored in the footer.
+    """
+    with _open_trace(trace_file) as file:
+        data = file.read(max(chunk_size, len(_MAGIC) + 1))
+        if data[:4] != _MAGIC:
+            raise ValueError(f"{trace_file} is not a search trace file.")
+
+        size = data[4]
+        state_bytes = _state_bytes(size)
+        # No record is longer than this: the kind, the packed state, and at most 3 varints or 2 doubles
+        max_record = 1 + state_bytes + 3 * 10 + 16
+        at_end = False
+        offset = 5
+        while True:
+            if not at_end and len(data) - offset < max_record:
+                # Keep the rest of the current chunk, so records can span chunk boundaries
+                data = data[offset:]
+                offset = 0
+                while not at_end and len(data) < max_record:
+                    chunk = file.read(chunk_size)
+                    at_end = not chunk
+                    data += chunk
+            if offset >= len(data):
+                return 0.0
+
+            kind = data[offset]
+            offset += 1
+            if kind == _FOOTER:
+                return struct.unpack_from('<d', data, offset)[0]
+
+            packed = int.from_bytes(data[offset:offset + state_bytes], 'little')
+            offset += state_bytes
+            level, offset = _read_varint(data, offset)
+            state = PuzzleState._from_packed(packed, size, level)
+
+            if kind == _INT_F_VALUE:
+                f, offset = _read_varint(data, offset)
+                h, offset = _read_varint(data, offset)
+                state._f_value = (f, h)
+            elif kind == _HALF_F_VALUE:
+                f, offset = _read_varint(data, offset)
+                h, offset = _read_varint(data, offset)
+                state._f_value = (f / 2, h / 2)
+            elif kind == _FLOAT_F_VALUE:
+                state._f_value = struct.unpack_from('<dd', data, offset)
+                offset += 16
+            yield state
+
+
+def render_search_file(trace_file: str, search_file: str) -> None:
+    """ Writes the text search file, the same as write_to_search_file() does, from a trace file
+
+    :param trace_file: The path to the trace file
+    :param search_file: The path to the text file to write to
+    :return: None
+    """
+    states = read_search_trace(trace_file)
+    with open(search_file, 'wt') as file:
+        file.write("Search Path:\n")
+        written = False
+        while True:
+            try:
+                state = next(states)
+            except StopIteration as stop:
+                elapsed = stop.value
+                break
+            file.write('State: ' + str(state) + ' Level: ' + str(state.level) + ' F-value:' + str(state.get_f_value()) + '\n')
+            written = True
+        if not written:
+            file.write("no solution")
+        else:
+            file.write("Time taken: " + str(elapsed))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Renders a search trace file as a text search file.")
+    parser.add_argument('trace_file', help="the trace file to render")
+    parser.add_argument('search_file', nargs='?',
+                        help="the text file to write. Default is the trace file with a .txt extension")
+    arguments = parser.parse_args()
+
+    search_file = arguments.search_file or arguments.trace_file.rsplit('.', 1)[0] + '.txt'
+    render_search_file(arguments.trace_file, search_file)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,188 @@
+from puzzle_state import _tile_bits
+from symmetry import canonical_form, transform_moves
+from collections import OrderedDict
+import sqlite3
+
+CACHE_FILE = '../solution_cache.sqlite'
+DEFAULT_CAPACITY = 4096
+
+# The open caches of this process, keyed by file
+_caches = {}
+
+
+def _index_bytes(size: int) -> int:
+    """ Gets the number of bytes used to store a tile index of a size-by-size puzzle
+
+    :param size: The size of the puzzle
+    :return: The number of bytes
+    """
+    return 1 if size * size <= 256 else 2
+
+
+def solution_moves(solution_path: list) -> list:
+    """ Gets the swaps made along a solution path
+
+    :param solution_path: The solution path, as a list of PuzzleStates
+    :return: The swaps, as pairs of row-major indices, or None if the path does not record them
+    """
+    moves = []
+    for state in solution_path[1:]:
+        if state._swapped is None:
+            return None
+        moves.append(state._swapped)
+    return moves
+
+
+def encode_moves(moves: list, size: int) -> bytes:
+    """ Encodes swaps as pairs of tile indices
+
+    :param moves: The swaps, as pairs of row-major indices
+    :param size: The size of the puzzle
+    :return: The encoded swaps
+    """
+    width = _index_bytes(size)
+    data = bytearray()
+    for move in moves:
+        for index in move:
+            data += index.to_bytes(width, 'little')
+    return bytes(data)
+
+
+def decode_moves(data: bytes, size: int) -> list:
+    """ Decodes the swaps encoded by encode_moves()
+
+    :param data: The encoded swaps
+    :param size: The size of the puzzle
+    :return: The swaps, as pairs of row-major indices
+    """
+    width = _index_bytes(size)
+    return [(int.from_bytes(data[offset:offset + width], 'little'),
+             int.from_bytes(data[offset + width:offset + 2 * width], 'little'))
+            for offset in range(0, len(data), 2 * width)]
+
+
+def replay_moves(start_state, moves: list) -> list:
+    """ Rebuilds a solution path by applying swaps to a start state
+
+    :param start_state: The starting PuzzleState
+    :param moves: The swaps, as pairs of row-major indices
+    :return: The solution path, as a list of PuzzleStates
+    """
+    solution_path = [start_state]
+    for first_index, second_index in moves:
+        solution_path.append(solution_path[-1]._swap(first_index, second_index))
+    return solution_path
+
+
+class SolutionCache:
+    """A cache of solution paths, shared by every goal state, kept in memory and in an sqlite file
+
+    Entries are keyed by the solver that found them and by the canonical form of the start state relative to its
+    goal (see symmetry.canonical_form()), and hold the length of the solution and its swaps, mapped through the
+    same symmetry. Since swaps do not depend on tile labels, the swaps are mapped back and replayed on the caller's
+    start state to get a solution path with the caller's labels. Puzzles that only differ by a relabelling of the
+    tiles or by a symmetry of the board share their entry. The most recently used entries are also kept in memory,
+    up to capacity entries.
+    """
+
+    def __init__(self, cache_file: str = CACHE_FILE, capacity: int = DEFAULT_CAPACITY):
+        self._capacity = capacity
+        self._entries = OrderedDict()
+        self._connection = sqlite3.connect(cache_file, timeout=60)
+        with self._connection:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("CREATE TABLE IF NOT EXISTS solutions (solver TEXT, size INTEGER, "
+                                     "state BLOB, length INTEGER, moves BLOB, PRIMARY KEY (solver, size, state))")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return self._connection.execute("SELECT COUNT(*) FROM solutions").fetchone()[0]
+
+    def close(self) -> None:
+        """ Closes the sqlite file
+
+        :return: None
+        """
+        self._connection.close()
+
+    def _key(self, solver: str, state, goal_state) -> tuple:
+        """ Gets the key of a start state and goal state
+
+        :param solver: The name of the solver
+        :param state: The start PuzzleState
+        :param goal_state: The goal state
+        :return: The key, as a tuple, and the index of the symmetry mapping the start state to its canonical form
+        """
+        size = state.size
+        state_bytes = (size * size * _tile_bits(size) + 7) // 8
+        canonical, transform_index = canonical_form(state, goal_state)
+        return (solver, size, canonical.to_bytes(state_bytes, 'little')), transform_index
+
+    def _remember(self, key: tuple, moves: bytes) -> None:
+        """ Keeps an entry in memory, evicting the least recently used entry if there are too many
+
+        :param key: The key of the entry
+        :param moves: The swaps of the entry
+        :return: None
+        """
+        self._entries[key] = moves
+        self._entries.move_to_end(key)
+        if len(self._entries) > self._capacity:
+            self._entries.popitem(last=False)
+
+    def lookup(self, solver: str, start_state, goal_state):
+        """ Looks up the solution of a puzzle
+
+        :param solver: The name of the solver, since different solvers find different solutions
+        :param start_state: The starting PuzzleState
+        :param goal_state: The goal state
+        :return: The solution path, as a list of PuzzleStates, or None if the puzzle is not in the cache
+        """
+        key, transform_index = self._key(solver, start_state, goal_state)
+        moves = self._entries.get(key)
+        if moves is None:
+            row = self._connection.execute("SELECT moves FROM solutions WHERE solver = ? AND size = ? AND state = ?",
+                                           key).fetchone()
+            if row is None:
+                return None
+            moves = row[0]
+        self._remember(key, moves)
+        size = start_state.size
+        return replay_moves(start_state, transform_moves(decode_moves(moves, size), size, transform_index, True))
+
+    def store(self, solver: str, solution_path: list, goal_state) -> None:
+        """ Adds the solution of a puzzle to the cache
+
+        :param solver: The name of the solver that found the solution
+        :param solution_path: The solution path, as a list of PuzzleStates starting with the start state
+        :param goal_state: The goal state
+        :return: None
+        """
+        moves = solution_moves(solution_path)
+        if moves is None:
+            return
+        size = goal_state.size
+        key, transform_index = self._key(solver, solution_path[0], goal_state)
+        moves = encode_moves(transform_moves(moves, size, transform_index), size)
+        self._remember(key, moves)
+        with self._connection:
+            self._connection.execute("INSERT OR REPLACE INTO solutions VALUES (?, ?, ?, ?, ?)",
+                                     key + (len(solution_path) - 1, moves))
+
+
+def get_solution_cache(cache_file: str = CACHE_FILE) -> SolutionCache:
+    """ Gets the solution cache of this process for a given file, opening it if needed
+
+    :param cache_file: The path to the sqlite file
+    :return: The SolutionCache
+    """
+    cache = _caches.get(cache_file)
+    if cache is None:
+        cache = SolutionCache(cache_file)
+        _caches[cache_file] = cache
+    return cache
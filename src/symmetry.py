@@ -0,0 +1,108 @@
+from puzzle_state import _pack, _tile_indices
+from functools import lru_cache
+
+
+@lru_cache(maxsize=None)
+def symmetries(size: int) -> tuple:
+    """ Gets the symmetries of a size-by-size board: the rotations, the reflections and the transposes
+
+    Each symmetry is a tuple where the item at position index is the index that tile moves to. The first
+    symmetry is always the identity.
+
+    :param size: The size of the puzzle
+    :return: The 8 symmetries, as a tuple
+    """
+    last = size - 1
+    maps = (lambda row, column: (row, column),
+            lambda row, column: (column, last - row),
+            lambda row, column: (last - row, last - column),
+            lambda row, column: (last - column, row),
+            lambda row, column: (row, last - column),
+            lambda row, column: (last - row, column),
+            lambda row, column: (column, row),
+            lambda row, column: (last - column, last - row))
+    transforms = []
+    for position_map in maps:
+        transform = []
+        for index in range(size * size):
+            row, column = position_map(*divmod(index, size))
+            transform.append(row * size + column)
+        transforms.append(tuple(transform))
+    return tuple(transforms)
+
+
+@lru_cache(maxsize=None)
+def inverse_symmetries(size: int) -> tuple:
+    """ Gets the inverses of the symmetries of a size-by-size board, in the same order as symmetries()
+
+    :param size: The size of the puzzle
+    :return: The 8 inverse symmetries, as a tuple
+    """
+    inverses = []
+    for transform in symmetries(size):
+        inverse = [0] * len(transform)
+        for index, image in enumerate(transform):
+            inverse[image] = index
+        inverses.append(tuple(inverse))
+    return tuple(inverses)
+
+
+def canonical_form(state, goal_state) -> tuple:
+    """ Maps a state to the representative of its symmetry class, relative to a goal state
+
+    The state is first relabelled so that the goal becomes the ascending state (each tile is named after its
+    index in the goal, starting from 0). A symmetry of the board then moves every tile, and renames it after
+    where its goal index moves to, which keeps the ascending goal in place. All the states of a class are
+    therefore the same number of swaps away from the goal. The representative is the smallest of the
+    (at most) 8 transformed states.
+
+    :param state: The PuzzleState
+    :param goal_state: The goal state
+    :return: The representative, packed with the ascending goal's labels, and the index of the symmetry that
+             maps the state to it, as a tuple
+    """
+    size = state.size
+    goal_indices = _tile_indices(goal_state.packed, size)
+    relabelled = [goal_indices[value] for value in state.tiles]
+    best = None
+    best_transform = 0
+    for transform_index, (transform, inverse) in enumerate(zip(symmetries(size), inverse_symmetries(size))):
+        transformed = [transform[relabelled[index]] for index in inverse]
+        if best is None or transformed < best:
+            best = transformed
+            best_transform = transform_index
+    return _pack([value + 1 for value in best], size), best_transform
+
+
+def transform_moves(moves, size: int, transform_index: int, inverse: bool = False) -> list:
+    """ Maps swaps through one of the symmetries of the board
+
+    A sequence of swaps solving a state solves its canonical form once mapped through the symmetry returned by
+    canonical_form(), and the other way around with inverse set.
+
+    :param moves: The swaps, as pairs of row-major indices
+    :param size: The size of the puzzle
+    :param transform_index: The index of the symmetry
+    :param inverse: Whether to map the swaps through the inverse of the symmetry. Default is False.
+    :return: The mapped swaps, as a list of pairs in the order of the swap table (lower index first)
+    """
+    transform = (inverse_symmetries(size) if inverse else symmetries(size))[transform_index]
+    mapped = []
+    for first_index, second_index in moves:
+        first_index, second_index = transform[first_index], transform[second_index]
+        mapped.append((first_index, second_index) if first_index < second_index else (second_index, first_index))
+    return mapped
+
+
+def symmetry_key(goal_state):
+    """ Gets a function mapping states to the packed representative of their symmetry class
+
+    Meant for the state_key of the searches, so that states which are symmetric to each other with respect to
+    the goal are detected as duplicates.
+
+    :param goal_state: The goal state
+    :return: The key function
+    """
+    def key(state) -> int:
+        return canonical_form(state, goal_state)[0]
+    return key
@@ -0,0 +1,103 @@
+from puzzle_state import _tile_bits, _tile_indices
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional: without it, the searches score states one at a time
+    np = None
+
+# Below this size, a batch of successors is too small for NumPy to beat the incremental heuristics
+MIN_VECTORIZED_SIZE = 4
+
+
+def tiles_array(states: list, size: int):
+    """ Stacks the tiles of many states into a single array
+
+    States that fit in 64 bits are unpacked with array shifts, the others go through PuzzleState.tiles.
+
+    :param states: The PuzzleStates, all of the same size
+    :param size: The size of the puzzle
+    :return: An array with one row per state, holding its tile values in row-major order
+    """
+    tile_count = size * size
+    bits = _tile_bits(size)
+    if tile_count * bits > 64:
+        return np.array([state.tiles for state in states], dtype=np.int64)
+
+    packed = np.fromiter((state.packed for state in states), dtype=np.uint64, count=len(states))
+    shifts = np.arange(tile_count, dtype=np.uint64) * np.uint64(bits)
+    tiles = (packed[:, np.newaxis] >> shifts) & np.uint64((1 << bits) - 1)
+    return tiles.astype(np.int64) + 1
+
+
+class BatchHeuristic:
+    """Computes one of the PuzzleState heuristics for a whole list of states at once, with NumPy
+
+    The goal lookup tables are built once, when the BatchHeuristic is created. Calling it with a list of states,
+    such as the successors of a state or a slice of the open list, returns the same values as calling the
+    heuristic on each state.
+    """
+
+    def __init__(self, heuristic_func, goal_state):
+        if np is None:
+            raise ImportError("NumPy is needed for the vectorised heuristics.")
+        kernels = {
+            'hamming_distance': self._hamming_distance,
+            'manhattan_distance': self._manhattan_distance,
+            'sum_permutation': self._sum_permutation,
+        }
+        if heuristic_func.__name__ not in kernels:
+            raise ValueError(f"No vectorised version of {heuristic_func.__name__}.")
+        self._kernel = kernels[heuristic_func.__name__]
+
+        size = goal_state.size
+        tile_count = size * size
+        self._size = size
+        self._goal_tiles = np.array(goal_state.tiles, dtype=np.int64)
+        # Indexed by tile value
+        self._goal_indices = np.array(_tile_indices(goal_state.packed, size), dtype=np.int64)
+        self._goal_rows = self._goal_indices // size
+        self._goal_columns = self._goal_indices % size
+        # Indexed by row-major index
+        self._rows = np.arange(tile_count, dtype=np.int64) // size
+        self._columns = np.arange(tile_count, dtype=np.int64) % size
+        self._pairs = np.triu(np.ones((tile_count, tile_count), dtype=bool), 1)
+
+    def __call__(self, states: list) -> list:
+        """ Computes the heuristic of every given state
+
+        :param states: The PuzzleStates, with the same size as the goal
+        :return: The heuristic values, as a list of Python numbers
+        """
+        if not states:
+            return []
+        return self._kernel(tiles_array(states, self._size)).tolist()
+
+    def _hamming_distance(self, tiles):
+        return np.count_nonzero(tiles != self._goal_tiles, axis=1)
+
+    def _manhattan_distance(self, tiles):
+        distances = (np.abs(self._rows - self._goal_rows[tiles])
+                     + np.abs(self._columns - self._goal_columns[tiles]))
+        return distances.sum(axis=1) / 2
+
+    def _sum_permutation(self, tiles):
+        ranks = self._goal_indices[tiles]
+        inversions = (ranks[:, :, np.newaxis] > ranks[:, np.newaxis, :]) & self._pairs
+        return inversions.sum(axis=(1, 2))
+
+
+def batch_heuristic(heuristic_func, goal_state, min_size: int = MIN_VECTORIZED_SIZE):
+    """ Gets a BatchHeuristic for a heuristic and goal, when it is worth using
+
+    :param heuristic_func: The heuristic function
+    :param goal_state: The goal state
+    :param min_size: The smallest puzzle size to vectorise. Default is MIN_VECTORIZED_SIZE.
+    :return: The BatchHeuristic, or None if NumPy is missing, the heuristic has no vectorised version,
+             or the puzzle is smaller than min_size
+    """
+    if np is None or goal_state.size < min_size:
+        return None
+    try:
+        return BatchHeuristic(heuristic_func, goal_state)
+    except ValueError:
+        return None
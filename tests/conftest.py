@@ -0,0 +1,30 @@
+import os
+import sys
+
+import pytest
+
+# The modules import each other by name, as when they are run from the src directory
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from distance_table import DistanceTable, build_distance_table  # noqa: E402
+from puzzle_state import PuzzleState  # noqa: E402
+
+GOAL_3X3 = ((1, 2, 3), (4, 5, 6), (7, 8, 9))
+
+# 3x3 boards with their exact distances to GOAL_3X3, checked against the distance table
+BOARDS_3X3 = [
+    ((4, 2, 6), (1, 9, 8), (5, 7, 3)),
+    ((2, 1, 3), (4, 5, 6), (7, 9, 8)),
+    ((1, 5, 2), (7, 4, 3), (8, 6, 9)),
+    ((3, 2, 1), (6, 5, 4), (9, 8, 7)),
+]
+
+
+@pytest.fixture(scope='session')
+def distance_table_3x3():
+    return DistanceTable(3, build_distance_table(3))
+
+
+@pytest.fixture
+def goal_3x3():
+    return PuzzleState(GOAL_3X3)
@@ -0,0 +1,37 @@
+import pytest
+
+from batch import Job, aggregate_results, solve_job
+from conftest import BOARDS_3X3, GOAL_3X3
+from puzzle_state import PuzzleState
+
+
+@pytest.fixture(autouse=True)
+def output_directory(tmp_path, monkeypatch):
+    # The output files are written to ../output, relative to the working directory
+    working_directory = tmp_path / 'src'
+    working_directory.mkdir()
+    monkeypatch.chdir(working_directory)
+
+
+@pytest.mark.parametrize('algorithm, heuristic, max_depth', [
+    ('ida_star', PuzzleState.manhattan_distance, 3),
+    ('iterative_deepening', None, 2),
+])
+def test_search_without_a_solution_is_not_solved(algorithm, heuristic, max_depth):
+    job = Job("Test", algorithm, heuristic, 1, BOARDS_3X3[3], GOAL_3X3, 60, max_depth)
+
+    result = solve_job(job)
+
+    assert not result.solved
+    assert result.exceeded is None
+    assert aggregate_results([result])[-1] == 1
+
+
+def test_solved_search_reports_its_length():
+    job = Job("Test", 'iterative_deepening', None, 1, BOARDS_3X3[1], GOAL_3X3, 60, 5)
+
+    result = solve_job(job)
+
+    assert result.solved
+    # The solution path holds the start state too
+    assert result.length_solution == 3
@@ -0,0 +1,28 @@
+import pytest
+
+from functions import read_state
+from puzzle_state import PuzzleState
+
+
+@pytest.mark.parametrize('line, puzzle', [
+    ('((1,2),(3,4))\n', ((1, 2), (3, 4))),
+    ('((4, 2, 6), (1, 9, 8), (5, 7, 3))\n', ((4, 2, 6), (1, 9, 8), (5, 7, 3))),
+    ('[[2, 1], [4, 3]]', ((2, 1), (4, 3))),
+])
+def test_read_state(line, puzzle):
+    assert read_state(line) == puzzle
+
+
+@pytest.mark.parametrize('line', [
+    '((0,1),(2,3))',
+    '((1,2),(3,3))',
+    '((1,2),(3,5))',
+])
+def test_read_state_rejects_other_tile_labels(line):
+    with pytest.raises(ValueError, match='exactly once'):
+        read_state(line)
+
+
+def test_puzzle_state_rejects_other_tile_labels():
+    with pytest.raises(ValueError):
+        PuzzleState(((0, 1), (2, 3)))
@@ -0,0 +1,38 @@
+import random
+
+import pytest
+
+from puzzle_state import PuzzleState
+
+
+def sum_permutation_reference(state, goal_state) -> int:
+    """ The sum permutation counted over every pair of tiles, as before the Fenwick tree """
+    goal_tiles = [value for row in goal_state.state for value in row]
+    tiles = [value for row in state.state for value in row]
+    total = 0
+    for current in goal_tiles:
+        left = goal_tiles[:goal_tiles.index(current)]
+        total += sum(value in left for value in tiles[tiles.index(current) + 1:])
+    return total
+
+
+def random_board(size: int, rng: random.Random) -> PuzzleState:
+    tiles = list(range(1, size * size + 1))
+    rng.shuffle(tiles)
+    return PuzzleState([tiles[row:row + size] for row in range(0, size * size, size)])
+
+
+@pytest.mark.parametrize('size', [2, 3, 4, 5])
+def test_sum_permutation_matches_the_pairwise_count(size):
+    rng = random.Random(size)
+    for _ in range(50):
+        state = random_board(size, rng)
+        goal_state = random_board(size, rng)
+        assert PuzzleState.sum_permutation(state, goal_state) == sum_permutation_reference(state, goal_state)
+
+
+def test_sum_permutation_examples():
+    state = PuzzleState(((1, 2, 3), (4, 5, 6), (7, 8, 9)))
+    goal_state = PuzzleState(((2, 1, 3), (9, 6, 4), (7, 8, 5)))
+    assert PuzzleState.sum_permutation(state, goal_state) == 10
+    assert PuzzleState.sum_permutation(goal_state, goal_state) == 0
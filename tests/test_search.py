@@ -0,0 +1,103 @@
+import pytest
+
+from conftest import BOARDS_3X3
+from puzzle_state import PuzzleState
+from search_stats import ExpansionCounter, SearchStats
+
+
+@pytest.mark.parametrize('board', BOARDS_3X3)
+def test_iterative_deepening_is_optimal(board, goal_3x3, distance_table_3x3):
+    start = PuzzleState(board)
+    distance = distance_table_3x3.distance(start, goal_3x3)
+
+    result = PuzzleState.iterative_deepening(start, goal_3x3, distance)
+
+    assert result.exceeded is None
+    assert len(result.solution_path) - 1 == distance
+    assert result.solution_path[-1] == goal_3x3
+
+
+@pytest.mark.parametrize('board', BOARDS_3X3)
+def test_iterative_deepening_stops_below_the_distance(board, goal_3x3, distance_table_3x3):
+    start = PuzzleState(board)
+    distance = distance_table_3x3.distance(start, goal_3x3)
+
+    result = PuzzleState.iterative_deepening(start, goal_3x3, distance - 1)
+
+    assert result.exceeded is None
+    assert result.solution_path is None
+
+
+def test_depth_limited_search_solves_within_its_limit(goal_3x3, distance_table_3x3):
+    start = PuzzleState(BOARDS_3X3[0])
+    distance = distance_table_3x3.distance(start, goal_3x3)
+
+    solution_path, _, _ = PuzzleState.depth_first_search(start, goal_3x3, distance + 2)
+
+    assert solution_path[-1] == goal_3x3
+    assert len(solution_path) - 1 <= distance + 2
+
+
+def test_path_checking_only_counts_expanded_states(goal_3x3):
+    start = PuzzleState(BOARDS_3X3[1])
+    stats = SearchStats()
+
+    solution_path, search_path, _ = PuzzleState.depth_first_search(start, goal_3x3, 4, path_checking=True,
+                                                                   stats=stats)
+
+    assert solution_path[-1] == goal_3x3
+    assert isinstance(search_path, ExpansionCounter)
+    assert len(search_path) == stats.expanded
+
+
+@pytest.mark.parametrize('board', BOARDS_3X3)
+def test_a_star_is_optimal(board, goal_3x3, distance_table_3x3):
+    start = PuzzleState(board)
+
+    result = PuzzleState.a_star(start, goal_3x3, PuzzleState.manhattan_distance)
+
+    assert len(result.solution_path) - 1 == distance_table_3x3.distance(start, goal_3x3)
+
+
+@pytest.mark.parametrize('board', BOARDS_3X3)
+def test_weighted_a_star_stays_within_its_bound(board, goal_3x3, distance_table_3x3):
+    start = PuzzleState(board)
+
+    result = PuzzleState.a_star(start, goal_3x3, PuzzleState.manhattan_distance, weight=2)
+
+    assert result.solution_path[-1] == goal_3x3
+    assert len(result.solution_path) - 1 <= 2 * distance_table_3x3.distance(start, goal_3x3)
+
+
+@pytest.mark.parametrize('board', BOARDS_3X3)
+def test_ida_star_is_optimal(board, goal_3x3, distance_table_3x3):
+    start = PuzzleState(board)
+    iteration_counts = []
+
+    result = PuzzleState.ida_star(start, goal_3x3, PuzzleState.manhattan_distance, iteration_counts=iteration_counts)
+
+    assert len(result.solution_path) - 1 == distance_table_3x3.distance(start, goal_3x3)
+    assert iteration_counts
+
+
+@pytest.mark.parametrize('heuristic', [None, PuzzleState.manhattan_distance])
+@pytest.mark.parametrize('board', BOARDS_3X3)
+def test_bidirectional_search_is_optimal(board, heuristic, goal_3x3, distance_table_3x3):
+    start = PuzzleState(board)
+
+    result = PuzzleState.bidirectional_search(start, goal_3x3, heuristic)
+
+    assert result.solution_path[0] == start
+    assert result.solution_path[-1] == goal_3x3
+    assert len(result.solution_path) - 1 == distance_table_3x3.distance(start, goal_3x3)
+
+
+@pytest.mark.parametrize('board', BOARDS_3X3)
+def test_sma_star_is_optimal_within_its_memory(board, goal_3x3, distance_table_3x3):
+    start = PuzzleState(board)
+    stats = SearchStats()
+
+    result = PuzzleState.sma_star(start, goal_3x3, PuzzleState.manhattan_distance, 40, stats=stats)
+
+    assert len(result.solution_path) - 1 == distance_table_3x3.distance(start, goal_3x3)
+    assert stats.peak_closed <= 40
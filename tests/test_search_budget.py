@@ -0,0 +1,64 @@
+import pytest
+
+from conftest import BOARDS_3X3
+from puzzle_state import PuzzleState
+from search_budget import MEMORY_BUDGET, NODE_BUDGET, TIME_BUDGET, SearchBudget
+from search_stats import SearchStats
+
+SEARCHES = {
+    'a_star': lambda start, goal, **options: PuzzleState.a_star(start, goal, PuzzleState.manhattan_distance,
+                                                                 **options),
+    'depth_first_search': lambda start, goal, **options: PuzzleState.depth_first_search(start, goal, **options),
+    'iterative_deepening': lambda start, goal, **options: PuzzleState.iterative_deepening(start, goal, 20,
+                                                                                           **options),
+    'ida_star': lambda start, goal, **options: PuzzleState.ida_star(start, goal, PuzzleState.manhattan_distance,
+                                                                     **options),
+    'bidirectional_search': lambda start, goal, **options: PuzzleState.bidirectional_search(start, goal, **options),
+}
+
+
+@pytest.mark.parametrize('search', SEARCHES)
+def test_node_budget_stops_the_search_on_time(search, goal_3x3):
+    stats = SearchStats()
+
+    result = SEARCHES[search](PuzzleState(BOARDS_3X3[3]), goal_3x3, stats=stats,
+                              budget=SearchBudget(max_expanded=50))
+
+    assert result.exceeded == NODE_BUDGET
+    assert result.solution_path is None
+    assert stats.expanded <= 50
+
+
+@pytest.mark.parametrize('search', SEARCHES)
+def test_time_budget_stops_the_search(search, goal_3x3):
+    result = SEARCHES[search](PuzzleState(BOARDS_3X3[3]), goal_3x3, budget=SearchBudget(time_limit=-1))
+
+    assert result.exceeded == TIME_BUDGET
+    assert result.solution_path is None
+
+
+def test_memory_budget_stops_a_star(goal_3x3):
+    result = PuzzleState.a_star(PuzzleState(BOARDS_3X3[3]), goal_3x3, PuzzleState.hamming_distance,
+                                budget=SearchBudget(max_live=100, check_interval=1))
+
+    assert result.exceeded == MEMORY_BUDGET
+
+
+# More expanded nodes than the 9! states of a 3x3 puzzle, so even DFS finishes
+@pytest.mark.parametrize('search', SEARCHES)
+def test_search_within_its_budget_is_not_stopped(search, goal_3x3):
+    result = SEARCHES[search](PuzzleState(BOARDS_3X3[1]), goal_3x3, budget=SearchBudget(max_expanded=400000))
+
+    assert result.exceeded is None
+    assert result.solution_path[-1] == goal_3x3
+
+
+def test_remaining_budget():
+    budget = SearchBudget(10, max_expanded=100, max_live=5)
+
+    remaining = budget.remaining(4, 30)
+
+    assert remaining.time_limit == 6
+    assert remaining.max_expanded == 70
+    assert remaining.max_live == 5
+    assert budget.remaining(4, 300).max_expanded == 0
@@ -0,0 +1,79 @@
+import pytest
+
+from conftest import BOARDS_3X3, GOAL_3X3
+from puzzle_state import PuzzleState, _swap_moves
+from solution_cache import SolutionCache, solution_moves
+
+
+@pytest.fixture
+def cache(tmp_path):
+    with SolutionCache(str(tmp_path / 'solution_cache.sqlite')) as cache:
+        yield cache
+
+
+def relabel(board, labels):
+    return tuple(tuple(labels[value] for value in row) for row in board)
+
+
+def rotate(board):
+    return tuple(zip(*board[::-1]))
+
+
+def assert_solves(solution_path, start, goal, length):
+    assert solution_path[0] == start
+    assert solution_path[-1] == goal
+    assert len(solution_path) - 1 == length
+    moves = set(_swap_moves(start.size))
+    assert all(move in moves for move in solution_moves(solution_path))
+
+
+@pytest.fixture
+def solved(cache, goal_3x3):
+    start = PuzzleState(BOARDS_3X3[0])
+    solution_path = PuzzleState.a_star(start, goal_3x3, PuzzleState.manhattan_distance).solution_path
+    cache.store('a_star', solution_path, goal_3x3)
+    return start, len(solution_path) - 1
+
+
+def test_lookup_finds_a_stored_solution(cache, solved, goal_3x3):
+    start, length = solved
+
+    assert_solves(cache.lookup('a_star', start, goal_3x3), start, goal_3x3, length)
+    assert cache.lookup('depth_first_search', start, goal_3x3) is None
+    assert cache.lookup('a_star', PuzzleState(BOARDS_3X3[1]), goal_3x3) is None
+
+
+def test_lookup_finds_a_relabelled_puzzle(cache, solved):
+    _, length = solved
+    labels = {value: 10 - value for value in range(1, 10)}
+    start = PuzzleState(relabel(BOARDS_3X3[0], labels))
+    goal = PuzzleState(relabel(GOAL_3X3, labels))
+
+    assert_solves(cache.lookup('a_star', start, goal), start, goal, length)
+
+
+def test_lookup_finds_a_rotated_puzzle(cache, solved):
+    _, length = solved
+    start = PuzzleState(rotate(BOARDS_3X3[0]))
+    goal = PuzzleState(rotate(GOAL_3X3))
+
+    assert_solves(cache.lookup('a_star', start, goal), start, goal, length)
+
+
+def test_solutions_are_kept_in_the_file(tmp_path, solved, goal_3x3):
+    start, length = solved
+
+    with SolutionCache(str(tmp_path / 'solution_cache.sqlite')) as reopened:
+        assert len(reopened) == 1
+        assert_solves(reopened.lookup('a_star', start, goal_3x3), start, goal_3x3, length)
+
+
+def test_search_reuses_the_cached_solution(cache, goal_3x3):
+    start = PuzzleState(BOARDS_3X3[2])
+    first = PuzzleState.a_star(start, goal_3x3, PuzzleState.manhattan_distance, cache=cache)
+
+    second = PuzzleState.a_star(start, goal_3x3, PuzzleState.manhattan_distance, cache=cache)
+
+    assert len(first.search_path) > 0
+    assert len(second.search_path) == 0
+    assert_solves(second.solution_path, start, goal_3x3, len(first.solution_path) - 1)